@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of result serialization: make_json_serializable vs dumps_json
+
+Builds result payloads from the sample email_data_*.json files at the
+repository root, shaped like the results of the sync pipeline and of the
+Celery analyze_submission task, and times the old path (recursive
+make_json_serializable, then json.dumps) against the single-pass path
+(model_dump(mode="json") / orjson).
+
+Usage:
+    python benchmark_json_serializer.py [--repeat 200]
+"""
+
+import os
+import sys
+import glob
+import json
+import timeit
+import argparse
+from datetime import datetime
+
+from services.ai_analysis_service import AIAnalysisService
+from utils.json_serializer import make_json_serializable, dumps_json
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def build_payloads(sample_path):
+    """Sync-style and Celery-style result payloads for one sample email"""
+    with open(sample_path, encoding="utf-8") as f:
+        email = json.load(f)
+
+    # Fallback analysis needs no API key: skip __init__, which creates the LLM client
+    analysis = AIAnalysisService.__new__(AIAnalysisService)._create_fallback_analysis(email)
+    body = str(email.get("body", ""))
+
+    sync_result = {
+        "email_data": {
+            "subject": str(email.get("subject", "")),
+            "sender": str(email.get("sender", "")),
+            "date": str(email.get("date", "")),
+            "body": body[:1000] + '...' if len(body) > 1000 else body
+        },
+        "attachments_processed": len(email.get("attachments", [])),
+        "attachments_uploaded": 0,
+        "documents_analyzed": len(email.get("attachments", [])),
+        "reinsurance_analysis": analysis,
+        "processing_mode": "synchronous"
+    }
+    celery_result = {
+        "email_data": {**email, "date": datetime.utcnow()},
+        "ai_analysis": analysis.model_dump(),
+        "processing_timestamp": datetime.utcnow().isoformat(),
+        "status": "completed"
+    }
+    return sync_result, celery_result
+
+
+def old_sync(result):
+    # process_reinsurance_msg_sync (two passes) then /task-result (a third) and JSONResponse
+    result = dict(result, reinsurance_analysis=make_json_serializable(result["reinsurance_analysis"]))
+    result = make_json_serializable(result)
+    return json.dumps(make_json_serializable(result)).encode()
+
+
+def new_sync(result):
+    result = dict(result, reinsurance_analysis=result["reinsurance_analysis"].model_dump(mode="json"))
+    return dumps_json(result)
+
+
+def old_generic(result):
+    return json.dumps(make_json_serializable(result)).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200, help="Calls per measurement")
+    args = parser.parse_args()
+
+    samples = sorted(glob.glob(os.path.join(SAMPLES_DIR, "email_data_*.json")))
+    if not samples:
+        print(f"No email_data_*.json samples found in {os.path.abspath(SAMPLES_DIR)}")
+        sys.exit(1)
+
+    print(f"{'payload':<52} {'bytes':>8} {'old ms':>8} {'new ms':>8} {'speedup':>8}  same")
+    for sample in samples:
+        sync_result, celery_result = build_payloads(sample)
+        name = os.path.basename(sample)[len("email_data_"):-len(".json")][:40]
+        cases = [
+            (f"sync   {name}", old_sync, new_sync, sync_result),
+            (f"celery {name}", old_generic, dumps_json, celery_result),
+        ]
+        for label, old, new, payload in cases:
+            old_output, new_output = old(payload), new(payload)
+            same = json.loads(old_output) == json.loads(new_output)
+            old_ms = timeit.timeit(lambda: old(payload), number=args.repeat) / args.repeat * 1000
+            new_ms = timeit.timeit(lambda: new(payload), number=args.repeat) / args.repeat * 1000
+            print(
+                f"{label:<52} {len(new_output):>8} {old_ms:>8.3f} {new_ms:>8.3f} "
+                f"{old_ms / new_ms:>7.1f}x  {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
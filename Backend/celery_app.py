@@ -2,7 +2,29 @@
 Celery application for background task processing
 """
 import os
-from celery import Celery
+import uuid
+from typing import Optional
+
+from celery import Celery, chain
+from celery.signals import before_task_publish, task_success
+
+from utils.celery_codec import CODECS, CodecMetrics, register_codecs, resolve_codec
+
+# Queues for the two pipeline steps, each served by its own worker pool:
+#   MSG parsing (CPU-bound)    celery -A celery_app worker -Q msg_parsing -P prefork -c <cores>
+#   Remote calls (I/O waits)   celery -A celery_app worker -Q remote_calls,celery -P threads -c 16
+# parse_msg hands attachments to analyze_submission as files in ATTACHMENT_STAGING_DIR,
+# which must be shared by both workers (same host or a common mount).
+CPU_QUEUE = os.getenv("CELERY_CPU_QUEUE", "msg_parsing")
+IO_QUEUE = os.getenv("CELERY_IO_QUEUE", "remote_calls")
+
+# Opt-in compact codecs (utils/celery_codec.py): msgpack, msgpack-zstd, orjson-zstd
+register_codecs()
+TASK_CODEC = resolve_codec(os.getenv("CELERY_TASK_CODEC", "json"))
+RESULT_CODEC = resolve_codec(os.getenv("CELERY_RESULT_CODEC", "json"))
+# Size metrics re-encode the payloads they measure: off by default, and sampled when on
+CODEC_METRICS_ENABLED = os.getenv("CELERY_CODEC_METRICS", "false").lower() == "true"
+CODEC_METRICS_SAMPLE_EVERY = int(os.getenv("CELERY_CODEC_METRICS_SAMPLE_EVERY", "20"))
 
 # Create Celery app
 celery_app = Celery(
@@ -14,15 +36,66 @@ celery_app = Celery(
 
 # Configure Celery
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    task_serializer=TASK_CODEC,
+    result_serializer=RESULT_CODEC,
+    # Every codec is accepted so workers and the API can switch codecs one at a time
+    accept_content=["json", *CODECS],
+    result_accept_content=["json", *CODECS],
     timezone="UTC",
     enable_utc=True,
     result_expires=3600,  # Results expire after 1 hour
     task_time_limit=600,  # 10 minute time limit
     task_soft_time_limit=540,  # 9 minute soft limit
+    task_routes={
+        "tasks.analysis_tasks.parse_msg": {"queue": CPU_QUEUE},
+        "tasks.analysis_tasks.analyze_submission": {"queue": IO_QUEUE},
+        "tasks.analysis_tasks.process_reinsurance_msg": {"queue": IO_QUEUE},
+    },
+    # Tasks run for minutes: reserve one at a time so idle workers can take the rest
+    worker_prefetch_multiplier=1,
+    # Acknowledge after completion so a crashed worker's task is redelivered
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
 )
 
+def _metrics_redis_client():
+    # Only the Redis result backend has a client; other backends keep metrics in-process
+    return celery_app.backend.client
+
+codec_metrics = CodecMetrics(redis_client_factory=_metrics_redis_client, sample_every=CODEC_METRICS_SAMPLE_EVERY)
+
+@before_task_publish.connect
+def record_message_size(sender=None, body=None, **kwargs):
+    if CODEC_METRICS_ENABLED:
+        codec_metrics.record(sender, "message", body, TASK_CODEC)
+
+@task_success.connect
+def record_result_size(sender=None, result=None, **kwargs):
+    if CODEC_METRICS_ENABLED:
+        codec_metrics.record(sender.name, "result", result, RESULT_CODEC)
+
+def analysis_pipeline(file_path: str, use_cache: bool = True, task_id: Optional[str] = None):
+    """
+    Signature of the analysis chain for one .msg file
+
+    parse_msg (CPU queue) feeds analyze_submission (remote-call queue).
+    task_id becomes the ID of the last step, which holds the status and the
+    result; parse_msg reports its progress under the same ID.
+
+    Tasks are referenced by name so the API does not import the task modules.
+    """
+    task_id = task_id or str(uuid.uuid4())
+    return chain(
+        celery_app.signature(
+            "tasks.analysis_tasks.parse_msg",
+            args=[file_path],
+            kwargs={"progress_task_id": task_id}
+        ),
+        celery_app.signature(
+            "tasks.analysis_tasks.analyze_submission",
+            kwargs={"use_cache": use_cache}
+        ).set(task_id=task_id)
+    )
+
 if __name__ == "__main__":
-    celery_app.start()
\ No newline at end of file
+    celery_app.start()
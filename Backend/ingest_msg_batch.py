@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Batch ingestion of .msg files for backfilling mailbox archives
+
+Parses every .msg file under a directory on a process pool and appends one
+JSON record per email to a JSONL file. Processed files are recorded in a
+manifest keyed by content hash, so an interrupted run can simply be started
+again and resumes where it stopped.
+
+Usage:
+    python ingest_msg_batch.py Data --output email_data.jsonl --attachments-dir extracted_attachments
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+from services.msg_reader_service import MSGFileReader, sanitize_directory_name
+from utils.file_hash import hash_file
+
+# Per-worker state set by _init_worker
+_known_hashes = frozenset()
+_attachments_dir = None
+
+
+def load_manifest(manifest_path):
+    """
+    Load the manifest of processed files.
+
+    Returns:
+        tuple: (set of processed content hashes, dict of path -> (size, mtime))
+    """
+    hashes = set()
+    files = {}
+    if not manifest_path.exists():
+        return hashes, files
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Partial line from an interrupted run
+                continue
+            hashes.add(entry['sha256'])
+            files[entry['path']] = (entry['size'], entry['mtime'])
+    return hashes, files
+
+
+def _init_worker(known_hashes, attachments_dir):
+    global _known_hashes, _attachments_dir
+    _known_hashes = known_hashes
+    _attachments_dir = attachments_dir
+
+
+def ingest_file(path):
+    """
+    Parse one .msg file (runs in a worker process).
+
+    Returns:
+        dict: Manifest fields plus 'status' ('processed', 'duplicate' or
+        'failed') and, when processed, the email 'record'
+    """
+    started_at = time.perf_counter()
+    # Placeholders until stat succeeds: a file that vanished or is unreadable is still
+    # reported as failed instead of raising out of the pool
+    result = {
+        'path': path,
+        'size': 0,
+        'mtime': None,
+    }
+
+    try:
+        stat = os.stat(path)
+        result['size'] = stat.st_size
+        result['mtime'] = stat.st_mtime
+        result['sha256'] = hash_file(path)
+        if result['sha256'] in _known_hashes:
+            # Same content already ingested under another name
+            result['status'] = 'duplicate'
+            return result
+
+        with MSGFileReader(path, lazy=True) as reader:
+            if not reader.read_msg_file():
+                raise ValueError('Failed to read email data')
+
+            record = reader.to_json_dict(include_attachment_data=False)
+            record['sha256'] = result['sha256']
+            record['size_bytes'] = stat.st_size
+
+            if _attachments_dir and record['attachments']:
+                # Hash suffix keeps directories unique and stable across runs
+                attachment_dir = Path(_attachments_dir) / (
+                    f"{sanitize_directory_name(Path(path).stem)[:60]}_{result['sha256'][:12]}"
+                )
+                record['attachment_dir'] = str(attachment_dir)
+                record['saved_attachments'] = reader.save_attachments(attachment_dir)
+
+        record['processing_ms'] = round((time.perf_counter() - started_at) * 1000, 1)
+        result['status'] = 'processed'
+        result['record'] = record
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+
+    return result
+
+
+def find_msg_files(data_directory, recursive=True):
+    """List .msg files under data_directory in a stable order."""
+    pattern = '**/*.msg' if recursive else '*.msg'
+    return sorted(str(path) for path in Path(data_directory).glob(pattern) if path.is_file())
+
+
+class ThroughputReport:
+    """Counts files and bytes and prints files/sec and MB/sec."""
+
+    def __init__(self, total_files, interval_seconds=10.0):
+        self.total_files = total_files
+        self.interval_seconds = interval_seconds
+        self.started_at = time.perf_counter()
+        self.last_report_at = self.started_at
+        self.counts = {'processed': 0, 'duplicate': 0, 'failed': 0, 'unchanged': 0}
+        self.bytes_read = 0
+
+    def add(self, status, size):
+        self.counts[status] += 1
+        if status != 'unchanged':
+            self.bytes_read += size
+        now = time.perf_counter()
+        if now - self.last_report_at >= self.interval_seconds:
+            self.last_report_at = now
+            self.print_line()
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        handled = self.counts['processed'] + self.counts['duplicate'] + self.counts['failed']
+        return {
+            **self.counts,
+            'total_files': self.total_files,
+            'elapsed_seconds': round(elapsed, 2),
+            'megabytes': round(self.bytes_read / (1024 * 1024), 2),
+            'files_per_second': round(handled / elapsed, 2),
+            'mb_per_second': round(self.bytes_read / (1024 * 1024) / elapsed, 2),
+        }
+
+    def print_line(self):
+        s = self.summary()
+        done = s['processed'] + s['duplicate'] + s['failed'] + s['unchanged']
+        print(
+            f"[{done}/{s['total_files']}] processed={s['processed']} duplicate={s['duplicate']} "
+            f"failed={s['failed']} skipped={s['unchanged']} | "
+            f"{s['files_per_second']} files/s, {s['mb_per_second']} MB/s",
+            file=sys.stderr,
+            flush=True
+        )
+
+
+def run_batch(
+    data_directory,
+    output_path,
+    manifest_path=None,
+    attachments_dir=None,
+    workers=None,
+    recursive=True,
+    report_interval=10.0
+):
+    """
+    Ingest all .msg files under data_directory.
+
+    Records are appended to output_path as they complete, then the file is
+    added to the manifest. Files already in the manifest (same path, size
+    and mtime, or same content hash) are skipped, so the command can be
+    re-run after an interruption. A crash between the two writes can repeat
+    at most the records in flight.
+
+    Returns:
+        dict: Throughput summary
+    """
+    output_path = Path(output_path)
+    manifest_path = Path(manifest_path) if manifest_path else output_path.with_suffix('.manifest.jsonl')
+    known_hashes, known_files = load_manifest(manifest_path)
+
+    msg_files = find_msg_files(data_directory, recursive)
+    report = ThroughputReport(len(msg_files), report_interval)
+
+    # Unchanged files are skipped without being read again
+    pending = []
+    for path in msg_files:
+        stat = os.stat(path)
+        if known_files.get(path) == (stat.st_size, stat.st_mtime):
+            report.add('unchanged', stat.st_size)
+        else:
+            pending.append(path)
+
+    print(
+        f"Found {len(msg_files)} .msg files in {data_directory}, "
+        f"{len(pending)} to process ({len(msg_files) - len(pending)} already in manifest)",
+        file=sys.stderr
+    )
+
+    if attachments_dir:
+        Path(attachments_dir).mkdir(parents=True, exist_ok=True)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if pending:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+        with open(output_path, 'a', encoding='utf-8') as output, \
+                open(manifest_path, 'a', encoding='utf-8') as manifest, \
+                multiprocessing.Pool(
+                    workers,
+                    initializer=_init_worker,
+                    initargs=(frozenset(known_hashes), attachments_dir)
+                ) as pool:
+            for result in pool.imap_unordered(ingest_file, pending):
+                status = result['status']
+                if status == 'processed':
+                    output.write(json.dumps(result.pop('record'), ensure_ascii=False, default=str) + '\n')
+                    output.flush()
+                if status == 'failed':
+                    # Not added to the manifest, so it is retried on the next run
+                    print(f"Failed: {result['path']}: {result['error']}", file=sys.stderr)
+                else:
+                    manifest.write(json.dumps({
+                        'path': result['path'],
+                        'size': result['size'],
+                        'mtime': result['mtime'],
+                        'sha256': result['sha256'],
+                    }) + '\n')
+                    manifest.flush()
+                report.add(status, result['size'])
+
+    report.print_line()
+    return report.summary()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest a directory of .msg files into a JSONL file.')
+    parser.add_argument('data_directory', nargs='?', default='Data', help='Directory containing .msg files')
+    parser.add_argument('--output', '-o', default='email_data.jsonl', help='JSONL file records are appended to')
+    parser.add_argument('--manifest', help='Manifest of processed files (default: <output>.manifest.jsonl)')
+    parser.add_argument('--attachments-dir', help='Also extract attachments under this directory')
+    parser.add_argument('--workers', '-w', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--no-recursive', action='store_true', help='Only scan the top-level directory')
+    parser.add_argument('--report-interval', type=float, default=10.0, help='Seconds between progress lines')
+    args = parser.parse_args(argv)
+
+    if not Path(args.data_directory).is_dir():
+        print(f"Directory {args.data_directory} does not exist.", file=sys.stderr)
+        return 1
+
+    summary = run_batch(
+        args.data_directory,
+        args.output,
+        manifest_path=args.manifest,
+        attachments_dir=args.attachments_dir,
+        workers=args.workers,
+        recursive=not args.no_recursive,
+        report_interval=args.report_interval
+    )
+    print(json.dumps(summary, indent=2))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
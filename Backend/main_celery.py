@@ -2,17 +2,27 @@
 # FastAPI backend with Celery integration and production fallback
 
 import os
-import tempfile
-from typing import Optional, Dict, Any
+import time
+import hashlib
+import zipfile
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import uuid
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 import logging
 
 from utils.redis_checker import is_redis_available, get_processing_mode
+from utils.json_serializer import FastJSONResponse
+from utils.upload_stream import stream_upload_to_tempfile, extract_zip_members, upload_metrics, UploadTooLargeError
+from utils.sync_executor import BoundedExecutor, QueueFullError
+from utils.result_store import ResultStore
+from utils.submission_index import SubmissionIndex
+from utils.batch_store import BatchStore
+from utils import task_events
 
 # Conditional imports for Redis/Celery
 REDIS_AVAILABLE = is_redis_available()
@@ -20,7 +30,7 @@ PROCESSING_MODE = get_processing_mode()
 
 if REDIS_AVAILABLE:
     from celery.result import AsyncResult
-    from celery_app import celery_app
+    from celery_app import celery_app, analysis_pipeline, codec_metrics, TASK_CODEC, RESULT_CODEC
     # Export celery app for celery worker command
     celery = celery_app
 else:
@@ -38,8 +48,49 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# In-memory storage for sync results (production fallback)
-sync_results = {}
+# Bounded in-memory storage for sync results (production fallback)
+sync_results = ResultStore(
+    ttl_seconds=float(os.getenv("RESULT_STORE_TTL_SECONDS", "3600")),
+    max_bytes=int(float(os.getenv("RESULT_STORE_MAX_MB", "256")) * 1024 * 1024),
+    spill_path=os.getenv("RESULT_STORE_PATH") or None
+)
+
+# Bounded worker pool for sync processing so the event loop is never blocked
+SYNC_WORKER_THREADS = int(os.getenv("SYNC_WORKER_THREADS", "2"))
+SYNC_QUEUE_DEPTH = int(os.getenv("SYNC_QUEUE_DEPTH", "8"))
+sync_executor = BoundedExecutor(max_workers=SYNC_WORKER_THREADS, max_queue=SYNC_QUEUE_DEPTH)
+
+# Server-Sent Events: comment line sent when a task is quiet, and the longest a stream stays open
+TASK_EVENT_KEEPALIVE_SECONDS = float(os.getenv("TASK_EVENT_KEEPALIVE_SECONDS", "15"))
+TASK_EVENT_STREAM_MAX_SECONDS = float(os.getenv("TASK_EVENT_STREAM_MAX_SECONDS", "1800"))
+
+# Build the shared services at startup instead of on the first sync request
+SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "true").lower() == "true"
+
+# Content-addressed deduplication of resent submissions
+SUBMISSION_DEDUP = os.getenv("SUBMISSION_DEDUP", "true").lower() == "true"
+# How long a submitted task may wait in the queue before duplicates stop attaching to it
+SUBMISSION_QUEUE_TIMEOUT_SECONDS = int(os.getenv("SUBMISSION_QUEUE_TIMEOUT_SECONDS", "1800"))
+
+# Batch submissions (many .msg files or zip archives in one request)
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "500"))
+MAX_BATCH_ZIP_SIZE_BYTES = int(float(os.getenv("MAX_BATCH_ZIP_MB", "1024")) * 1024 * 1024)
+
+if REDIS_AVAILABLE and celery_app:
+    import redis
+    redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    submission_index = SubmissionIndex(
+        redis_client=redis_client,
+        ttl_seconds=int(celery_app.conf.result_expires),
+        queue_timeout_seconds=SUBMISSION_QUEUE_TIMEOUT_SECONDS
+    )
+    batch_store = BatchStore(redis_client=redis_client, ttl_seconds=int(celery_app.conf.result_expires))
+else:
+    submission_index = SubmissionIndex(
+        ttl_seconds=int(sync_results.ttl_seconds),
+        queue_timeout_seconds=SUBMISSION_QUEUE_TIMEOUT_SECONDS
+    )
+    batch_store = BatchStore(ttl_seconds=int(sync_results.ttl_seconds))
 
 # Data models
 class TaskSubmissionResponse(BaseModel):
@@ -55,19 +106,60 @@ class TaskStatusResponse(BaseModel):
     result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
 
+class BatchItem(BaseModel):
+    filename: str
+    task_id: Optional[str] = None
+    status: str  # submitted, duplicate, attached or rejected
+    state: Optional[str] = None  # Task state (PENDING, PROGRESS, SUCCESS, FAILURE) in batch status
+    progress: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchSubmissionResponse(BaseModel):
+    batch_id: str
+    message: str
+    total: int
+    submitted: int
+    duplicates: int
+    rejected: int
+    items: List[BatchItem]
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    total: int
+    progress: float
+    completed: bool
+    counts: Dict[str, int]
+    elapsed_seconds: float
+    files_per_minute: float
+    items: List[BatchItem]
+
 # Sync processing functions for production fallback
-async def process_sync_analysis(temp_file_path: str, filename: str) -> str:
+def _run_sync_analysis(task_id: str, temp_file_path: str, filename: str, use_cache: bool = True):
     """
-    Process analysis synchronously when Redis/Celery unavailable
+    Run the sync pipeline on a worker thread and record its progress
     """
-    task_id = str(uuid.uuid4())
-    
+    def report_progress(progress: float, status: str):
+        sync_results.set(task_id, {
+            'status': 'PROGRESS',
+            'progress': progress,
+            'current_status': status
+        }, persist=False)
+        task_events.publish_stage(task_id, progress, status)
+
+    token_events = task_events.TokenPublisher(task_id)
+
     try:
         # Import the actual processing logic
         from tasks.analysis_tasks_sync import process_reinsurance_msg_sync
         
-        # Process synchronously
-        result = process_reinsurance_msg_sync(temp_file_path)
+        result = process_reinsurance_msg_sync(
+            temp_file_path,
+            progress_callback=report_progress,
+            use_cache=use_cache,
+            document_callback=task_events.document_publisher(task_id),
+            token_callback=token_events
+        )
+        token_events.flush()
         
         # Store result in memory
         sync_results[task_id] = {
@@ -77,6 +169,8 @@ async def process_sync_analysis(temp_file_path: str, filename: str) -> str:
             'result': result
         }
         
+        task_events.publish(task_id, 'completed', progress=100.0, status='Analysis completed')
+        
         logger.info(f"Sync processing completed for {filename}")
         
     except Exception as e:
@@ -86,18 +180,41 @@ async def process_sync_analysis(temp_file_path: str, filename: str) -> str:
             'current_status': 'Analysis failed',
             'error': str(e)
         }
+        task_events.publish(task_id, 'failed', status='Analysis failed', error=str(e))
+    finally:
+        # Clean up temp file
+        try:
+            os.unlink(temp_file_path)
+        except Exception:
+            pass
+
+def process_sync_analysis(temp_file_path: str, filename: str, task_id: Optional[str] = None, use_cache: bool = True) -> str:
+    """
+    Queue analysis on the bounded sync worker pool when Redis/Celery unavailable
+    
+    Returns the task ID immediately; progress is reported through sync_results.
+    
+    Raises:
+        QueueFullError: If the worker pool and its queue are full
+    """
+    task_id = task_id or str(uuid.uuid4())
+    sync_results.set(task_id, {
+        'status': 'PENDING',
+        'progress': 0.0,
+        'current_status': 'Task is waiting to be processed'
+    }, persist=False)
     
-    # Clean up temp file
     try:
-        os.unlink(temp_file_path)
-    except Exception:
-        pass
+        sync_executor.submit(_run_sync_analysis, task_id, temp_file_path, filename, use_cache)
+    except QueueFullError:
+        sync_results.pop(task_id, None)
+        raise
     
     return task_id
 
 def get_sync_task_result(task_id: str) -> Dict[str, Any]:
     """
-    Get sync task result from memory
+    Get sync task result from the result store
     """
     return sync_results.get(task_id, {
         'status': 'PENDING',
@@ -105,6 +222,115 @@ def get_sync_task_result(task_id: str) -> Dict[str, Any]:
         'progress': 0.0
     })
 
+def get_task_state(task_id: str) -> Optional[str]:
+    """
+    Get the current state of a task in either processing mode
+    """
+    if REDIS_AVAILABLE and celery_app:
+        from celery.result import AsyncResult
+        return AsyncResult(task_id, app=celery_app).state
+    result_data = sync_results.get(task_id)
+    return result_data['status'] if result_data else None
+
+def get_task_progress(task_ids: List[str]) -> Dict[str, Tuple[str, float]]:
+    """
+    State and progress of many tasks, in one result backend round trip in async mode
+    """
+    if not task_ids:
+        return {}
+    
+    if REDIS_AVAILABLE and celery_app:
+        backend = celery_app.backend
+        try:
+            payloads = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+            metas = [backend.decode_result(payload) if payload else {'status': 'PENDING'} for payload in payloads]
+        except (AttributeError, NotImplementedError):
+            from celery.result import AsyncResult
+            results = [AsyncResult(task_id, app=celery_app) for task_id in task_ids]
+            metas = [{'status': result.state, 'result': result.info} for result in results]
+    else:
+        metas = []
+        for task_id in task_ids:
+            result_data = sync_results.get(task_id)
+            if result_data is None:
+                metas.append({'status': 'PENDING'})
+            else:
+                metas.append({'status': result_data['status'], 'result': {'progress': result_data.get('progress', 0.0)}})
+    
+    progress = {}
+    for task_id, meta in zip(task_ids, metas):
+        state = meta.get('status', 'PENDING')
+        if state in ('SUCCESS', 'FAILURE'):
+            progress[task_id] = (state, 100.0)
+        else:
+            info = meta.get('result')
+            progress[task_id] = (state, float(info.get('progress', 0.0)) if isinstance(info, dict) else 0.0)
+    return progress
+
+def is_task_reusable(task_id: str) -> bool:
+    """
+    A task can serve a duplicate submission if it succeeded or is still running
+    
+    Celery reports PENDING for unknown, expired and lost task IDs as well as
+    queued ones, so PENDING only counts for tasks recently marked as queued.
+    """
+    state = get_task_state(task_id)
+    if state == 'PENDING':
+        return submission_index.is_queued(task_id)
+    return state in ('STARTED', 'RETRY', 'PROGRESS', 'SUCCESS')
+
+async def claim_submission(temp_file_path: str, file_digest: str, task_id: str) -> Tuple[Optional[str], List[str]]:
+    """
+    Claim a submission's digests for task_id unless an identical one is known
+    
+    Identical upload bytes are checked first, then the same email content in
+    a different container.
+    
+    Returns:
+        (existing task ID to reuse or None, digests now owned by task_id)
+    """
+    digests = [f"file:{file_digest}"]
+    # Marked before any digest is claimed, so a duplicate arriving while the
+    # fingerprint is computed sees a queued owner and attaches to it
+    submission_index.mark_queued(task_id)
+    existing_task_id = submission_index.claim(digests, task_id, is_task_reusable)
+    if existing_task_id is not None:
+        return existing_task_id, []
+    
+    fingerprint = await run_in_threadpool(compute_submission_fingerprint, temp_file_path)
+    if fingerprint:
+        content_digests = [f"content:{fingerprint}"]
+        existing_task_id = submission_index.claim(content_digests, task_id, is_task_reusable)
+        if existing_task_id:
+            submission_index.release(digests, task_id)
+            return existing_task_id, []
+        digests.extend(content_digests)
+    return None, digests
+
+def compute_submission_fingerprint(msg_file_path: str) -> Optional[str]:
+    """
+    Fingerprint a .msg by normalized body and attachment digests
+    
+    Uses a lazy reader so attachments are hashed as streams rather than
+    loaded into the API process, and closes it so the file can be removed.
+    """
+    try:
+        from services.msg_reader_service import MSGFileReader
+        with MSGFileReader(msg_file_path, lazy=True) as msg_reader:
+            if not msg_reader.read_msg_file():
+                return None
+            return msg_reader.compute_content_fingerprint()
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {msg_file_path}: {str(e)}")
+        return None
+
+@app.on_event("startup")
+def warm_up_services():
+    """Initialize the sync pipeline's shared services before serving requests"""
+    if SERVICE_WARMUP and not REDIS_AVAILABLE:
+        from services.service_registry import warm_up
+        logger.info(f"Service warm-up: {warm_up()}")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -115,35 +341,90 @@ async def health_check():
     """Health check endpoint for monitoring"""
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics for monitoring"""
+    from services.document_processing_service import get_parse_cache
+    from services.cloudinary_service import get_upload_index
+    from services.ai_analysis_service import get_llm_cache
+    from services import service_registry
+    parse_cache = get_parse_cache()
+    upload_index = get_upload_index()
+    llm_cache = get_llm_cache()
+    return {
+        "processing_mode": PROCESSING_MODE,
+        "uploads": upload_metrics.snapshot(),
+        "sync_executor": sync_executor.stats(),
+        "sync_results": sync_results.stats(),
+        "deduplication": submission_index.stats(),
+        "parse_cache": parse_cache.stats() if parse_cache else None,
+        "cloudinary_index": upload_index.stats() if upload_index else None,
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "task_events": task_events.get_broadcaster().stats(),
+        "batches": batch_store.stats(),
+        "celery_codec": {
+            "task_codec": TASK_CODEC,
+            "result_codec": RESULT_CODEC,
+            "tasks": codec_metrics.stats()
+        } if REDIS_AVAILABLE and celery_app else None,
+        "services": service_registry.stats()
+    }
+
 @app.post("/submit-analysis", response_model=TaskSubmissionResponse)
-async def submit_analysis(file: UploadFile = File(...)):
+async def submit_analysis(file: UploadFile = File(...), force_reanalysis: bool = False):
     """
     Submit a .msg file for facultative reinsurance analysis
     Returns task ID for polling status
+    
+    force_reanalysis skips duplicate detection and the LLM response cache,
+    so the submission is analysed again from scratch.
     """
     try:
         # Validate file type
         if not file.filename or not file.filename.endswith('.msg'):
             raise HTTPException(status_code=400, detail="Only .msg files are supported")
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.msg') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Stream uploaded file to disk in chunks, hashing as we go
+        file_hash = hashlib.sha256()
+        try:
+            temp_file_path = await stream_upload_to_tempfile(file, suffix='.msg', hasher=file_hash)
+        except UploadTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        if REDIS_AVAILABLE and celery_app:
-            # Use async processing with Celery
-            task = celery_app.send_task(
-                'tasks.analysis_tasks.process_reinsurance_msg',
-                args=[temp_file_path]
+        task_id = str(uuid.uuid4())
+        digests = []
+        existing_task_id = None
+        
+        if SUBMISSION_DEDUP and not force_reanalysis:
+            existing_task_id, digests = await claim_submission(temp_file_path, file_hash.hexdigest(), task_id)
+        
+        if existing_task_id:
+            os.unlink(temp_file_path)
+            finished = get_task_state(existing_task_id) == 'SUCCESS'
+            submission_index.record_hit(finished)
+            logger.info(f"Duplicate submission {file.filename} served by task {existing_task_id}")
+            return TaskSubmissionResponse(
+                task_id=existing_task_id,
+                message=f"Identical submission already {'analysed' if finished else 'in progress'} for {file.filename}",
+                status="duplicate" if finished else "attached"
             )
-            task_id = task.id
-            logger.info(f"Submitted async task {task_id} for file {file.filename}")
-        else:
-            # Use sync processing
-            task_id = await process_sync_analysis(temp_file_path, file.filename)
-            logger.info(f"Processed sync task {task_id} for file {file.filename}")
+        
+        try:
+            if REDIS_AVAILABLE and celery_app:
+                # Use async processing with Celery: MSG parsing, then the remote calls
+                analysis_pipeline(temp_file_path, use_cache=not force_reanalysis, task_id=task_id).apply_async()
+                logger.info(f"Submitted async task {task_id} for file {file.filename}")
+            else:
+                # Use sync processing on the bounded worker pool
+                try:
+                    process_sync_analysis(temp_file_path, file.filename, task_id=task_id, use_cache=not force_reanalysis)
+                except QueueFullError as e:
+                    os.unlink(temp_file_path)
+                    raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+                logger.info(f"Queued sync task {task_id} for file {file.filename}")
+        except Exception:
+            submission_index.release(digests, task_id)
+            raise
         
         return TaskSubmissionResponse(
             task_id=task_id,
@@ -151,10 +432,223 @@ async def submit_analysis(file: UploadFile = File(...)):
             status="submitted"
         )
         
+    except HTTPException:
+        # Re-raise HTTP exceptions without wrapping them
+        raise
     except Exception as e:
         logger.error(f"Error submitting analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error submitting analysis: {str(e)}")
 
+async def collect_batch_files(files: List[UploadFile]) -> List[Dict[str, Any]]:
+    """
+    Stream every upload of a batch to disk, expanding zip archives
+    
+    Returns:
+        One entry per .msg file with 'filename' and either 'path' and
+        'sha256' or 'error'
+    
+    Raises:
+        HTTPException: 413 if the batch holds more than MAX_BATCH_FILES files
+    """
+    entries = []
+    try:
+        for upload in files:
+            name = upload.filename or ''
+            if name.lower().endswith('.msg'):
+                file_hash = hashlib.sha256()
+                try:
+                    path = await stream_upload_to_tempfile(upload, suffix='.msg', hasher=file_hash)
+                    entries.append({'filename': name, 'path': path, 'sha256': file_hash.hexdigest()})
+                except UploadTooLargeError as e:
+                    entries.append({'filename': name, 'error': str(e)})
+            elif name.lower().endswith('.zip'):
+                try:
+                    zip_path = await stream_upload_to_tempfile(upload, suffix='.zip', max_size=MAX_BATCH_ZIP_SIZE_BYTES)
+                except UploadTooLargeError as e:
+                    entries.append({'filename': name, 'error': str(e)})
+                    continue
+                try:
+                    # One member past the limit is enough to reject the batch
+                    entries.extend(await run_in_threadpool(
+                        extract_zip_members, zip_path, '.msg', None, MAX_BATCH_FILES - len(entries) + 1
+                    ))
+                except zipfile.BadZipFile:
+                    entries.append({'filename': name, 'error': 'Not a valid zip archive'})
+                finally:
+                    os.unlink(zip_path)
+            else:
+                entries.append({'filename': name, 'error': 'Only .msg files and .zip archives are supported'})
+            
+            if len(entries) > MAX_BATCH_FILES:
+                raise HTTPException(status_code=413, detail=f"A batch can contain at most {MAX_BATCH_FILES} files")
+    except BaseException:
+        for entry in entries:
+            if 'path' in entry:
+                os.unlink(entry['path'])
+        raise
+    return entries
+
+@app.post("/submit-analysis-batch", response_model=BatchSubmissionResponse)
+async def submit_analysis_batch(files: List[UploadFile] = File(...), force_reanalysis: bool = False):
+    """
+    Submit many .msg files, or zip archives of them, in one request
+    
+    Each file is streamed to disk and deduplicated like /submit-analysis.
+    In async mode all new tasks are published as one Celery group over a
+    single broker connection. Returns the batch ID for /batch-status and
+    the task ID of every item; files that cannot be accepted are listed as
+    rejected with the reason.
+    """
+    pending_paths = set()
+    try:
+        started_at = time.perf_counter()
+        entries = await collect_batch_files(files)
+        pending_paths = {entry['path'] for entry in entries if 'path' in entry}
+        use_cache = not force_reanalysis
+        
+        batch_id = str(uuid.uuid4())
+        items: List[BatchItem] = []
+        queued = []  # (item, path, digests) waiting for the Celery group
+        
+        for entry in entries:
+            if 'error' in entry:
+                items.append(BatchItem(filename=entry['filename'], status='rejected', error=entry['error']))
+                continue
+            
+            path = entry['path']
+            task_id = str(uuid.uuid4())
+            digests = []
+            existing_task_id = None
+            if SUBMISSION_DEDUP and not force_reanalysis:
+                existing_task_id, digests = await claim_submission(path, entry['sha256'], task_id)
+            
+            if existing_task_id:
+                os.unlink(path)
+                pending_paths.discard(path)
+                finished = get_task_state(existing_task_id) == 'SUCCESS'
+                submission_index.record_hit(finished)
+                items.append(BatchItem(
+                    filename=entry['filename'],
+                    task_id=existing_task_id,
+                    status='duplicate' if finished else 'attached'
+                ))
+                continue
+            
+            item = BatchItem(filename=entry['filename'], task_id=task_id, status='submitted')
+            items.append(item)
+            
+            if REDIS_AVAILABLE and celery_app:
+                queued.append((item, path, digests))
+                continue
+            
+            # Sync mode: queued right away, so later duplicates in the batch see the task
+            try:
+                process_sync_analysis(path, entry['filename'], task_id=task_id, use_cache=use_cache)
+            except QueueFullError as e:
+                os.unlink(path)
+                submission_index.release(digests, task_id)
+                item.task_id = None
+                item.status = 'rejected'
+                item.error = str(e)
+            pending_paths.discard(path)
+        
+        if queued:
+            from celery import group
+            try:
+                group(
+                    analysis_pipeline(path, use_cache=use_cache, task_id=item.task_id)
+                    for item, path, _ in queued
+                ).apply_async()
+            except Exception:
+                for item, _, digests in queued:
+                    submission_index.release(digests, item.task_id)
+                raise
+            pending_paths.clear()
+        
+        enqueue_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        submitted = sum(1 for item in items if item.status == 'submitted')
+        duplicates = sum(1 for item in items if item.status in ('duplicate', 'attached'))
+        rejected = sum(1 for item in items if item.status == 'rejected')
+        
+        batch_store.create(batch_id, {
+            'batch_id': batch_id,
+            'created_at': time.time(),
+            'enqueue_ms': enqueue_ms,
+            'items': [item.model_dump(exclude={'state', 'progress'}) for item in items]
+        })
+        logger.info(
+            f"Batch {batch_id}: {submitted} submitted, {duplicates} duplicates, {rejected} rejected "
+            f"in {enqueue_ms} ms ({PROCESSING_MODE} mode)"
+        )
+        
+        return BatchSubmissionResponse(
+            batch_id=batch_id,
+            message=f"Batch of {len(items)} files accepted ({PROCESSING_MODE} mode)",
+            total=len(items),
+            submitted=submitted,
+            duplicates=duplicates,
+            rejected=rejected,
+            items=items
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error submitting batch: {str(e)}")
+    finally:
+        # Files never handed to a task
+        for path in pending_paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+@app.get("/batch-status/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(batch_id: str):
+    """
+    Aggregate progress of a batch and the state of each of its tasks
+    """
+    batch = batch_store.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found or expired")
+    
+    task_ids = [item['task_id'] for item in batch['items'] if item.get('task_id')]
+    task_progress = get_task_progress(task_ids)
+    
+    items = []
+    counts: Dict[str, int] = {}
+    for stored in batch['items']:
+        item = BatchItem(**stored)
+        if item.task_id:
+            item.state, item.progress = task_progress[item.task_id]
+            counts[item.state] = counts.get(item.state, 0) + 1
+        items.append(item)
+    
+    tracked = [item for item in items if item.task_id]
+    finished = counts.get('SUCCESS', 0) + counts.get('FAILURE', 0)
+    completed = finished == len(tracked)
+    
+    # Throughput covers the tasks this batch started, up to when the last one finished
+    if completed and 'completed_at' not in batch:
+        batch['completed_at'] = time.time()
+        batch_store.update(batch_id, batch)
+    elapsed = max(batch.get('completed_at', time.time()) - batch['created_at'], 1e-9)
+    finished_submitted = sum(
+        1 for item in tracked if item.status == 'submitted' and item.state in ('SUCCESS', 'FAILURE')
+    )
+    
+    return BatchStatusResponse(
+        batch_id=batch_id,
+        total=len(items),
+        progress=round(sum(item.progress for item in tracked) / len(tracked), 1) if tracked else 100.0,
+        completed=completed,
+        counts=counts,
+        elapsed_seconds=round(elapsed, 2),
+        files_per_minute=round(finished_submitted / elapsed * 60, 2),
+        items=items
+    )
+
 @app.get("/task-status/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str):
     """
@@ -232,10 +726,51 @@ async def get_task_status(task_id: str):
         logger.error(f"Error getting task status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error getting task status: {str(e)}")
 
-@app.get("/task-result/{task_id}")
+@app.get("/task-events/{task_id}")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    Stream the progress of an analysis task as Server-Sent Events
+    
+    The first 'status' event is the task's current state (as returned by
+    /task-status, without the result). It is followed by 'stage' events for
+    pipeline steps, 'document' events as each attachment is parsed, 'token'
+    events with the analysis response as it is generated, and finally a
+    'completed' or 'failed' event, after which the stream ends. Fetch
+    /task-result once 'completed' arrives.
+    """
+    async def event_stream():
+        # Subscribe before reading the state so no transition is missed in between
+        async with task_events.get_broadcaster().subscribe(task_id) as subscription:
+            snapshot = await get_task_status(task_id)
+            yield task_events.format_sse({"type": "status", **snapshot.model_dump(exclude={'result'})})
+            if snapshot.status in ('SUCCESS', 'FAILURE'):
+                return
+            
+            deadline = time.monotonic() + TASK_EVENT_STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                if await request.is_disconnected():
+                    return
+                event = await subscription.get(TASK_EVENT_KEEPALIVE_SECONDS)
+                if event is None:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield task_events.format_sse(event)
+                if event['type'] in task_events.TERMINAL_EVENTS:
+                    return
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/task-result/{task_id}", response_class=FastJSONResponse)
 async def get_task_result(task_id: str):
     """
     Get the detailed result of a completed analysis task
+    
+    Results are rendered with orjson in a single pass (utils.json_serializer).
     """
     try:
         if REDIS_AVAILABLE and celery_app:
@@ -243,7 +778,7 @@ async def get_task_result(task_id: str):
             result = AsyncResult(task_id, app=celery_app)
         
             if result.state == 'SUCCESS':
-                return JSONResponse(content=result.result)
+                return FastJSONResponse(content=result.result)
             elif result.state == 'FAILURE':
                 raise HTTPException(status_code=400, detail=f"Task failed: {result.info}")
             else:
@@ -252,14 +787,10 @@ async def get_task_result(task_id: str):
             # For sync processing, get from memory
             result_data = get_sync_task_result(task_id)
             if result_data['status'] == 'SUCCESS':
-                # Ensure the result is JSON serializable
-                from utils.json_serializer import make_json_serializable
                 task_result = result_data.get('result', {})
                 
                 try:
-                    # Convert to JSON serializable format
-                    serializable_result = make_json_serializable(task_result)
-                    return JSONResponse(content=serializable_result)
+                    return FastJSONResponse(content=task_result)
                 except Exception as e:
                     logger.error(f"JSON serialization error for task {task_id}: {str(e)}")
                     logger.error(f"Result type: {type(task_result)}")
@@ -2,7 +2,7 @@
 Pydantic models for the Facultative Reinsurance Working Sheet
 Based on Appendix 1 format from Kenya Re guidelines
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, create_model
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -85,6 +85,28 @@ class FacultativeReinsuranceWorkingSheet(BaseModel):
     analysis_timestamp: datetime = Field(default_factory=datetime.utcnow)
     analysis_version: str = Field(default="1.0")
 
+# Factual working sheet fields that can be read off a single document or chunk;
+# the remaining fields are underwriting judgements made over the whole submission
+EXTRACTION_FIELDS = [
+    "insured", "cedant", "broker",
+    "perils_covered", "geographical_limit", "situation_of_risk", "occupation_of_insured", "main_activities",
+    "total_sum_insured", "tsi_breakdown", "excess_deductible", "retention_of_cedant",
+    "possible_maximum_loss_pml", "cat_exposure", "period_of_insurance", "reinsurance_deductions",
+    "claims_experience_last_3_years", "loss_ratio_percentage",
+    "share_offered", "inward_acceptances", "risk_surveyors_report",
+    "premium_rates", "premium_original_currency", "original_currency", "liability_original_currency",
+]
+
+WorkingSheetExtract = create_model(
+    "WorkingSheetExtract",
+    __doc__="Partial working sheet facts extracted from one document or chunk",
+    **{
+        name: (FacultativeReinsuranceWorkingSheet.model_fields[name].annotation,
+               FacultativeReinsuranceWorkingSheet.model_fields[name])
+        for name in EXTRACTION_FIELDS
+    }
+)
+
 class ClaimsExperience(BaseModel):
     """Model for claims experience data"""
     year: int
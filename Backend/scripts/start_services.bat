@@ -29,9 +29,12 @@ start "Redis" redis-server
 REM Wait a moment for Redis to start
 timeout /t 3 /nobreak >nul
 
-REM Start Celery worker
-echo Starting Celery worker...
-start "Celery Worker" poetry run celery -A celery_app worker --loglevel=info --concurrency=2
+REM Start Celery workers: MSG parsing and remote calls (prefork is not supported on Windows)
+REM Both run on this host, so they share ATTACHMENT_STAGING_DIR
+if not defined ATTACHMENT_STAGING_DIR set ATTACHMENT_STAGING_DIR=%TEMP%\reinsurance_attachments
+echo Starting Celery workers...
+start "Celery MSG Parsing" poetry run celery -A celery_app worker --loglevel=info -Q msg_parsing -P solo -n cpu@%%h
+start "Celery Remote Calls" poetry run celery -A celery_app worker --loglevel=info -Q remote_calls,celery -P threads --concurrency=16 -n io@%%h
 
 REM Start FastAPI server
 echo Starting FastAPI server...
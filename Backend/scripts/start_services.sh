@@ -31,10 +31,14 @@ else
     echo "   docker run -d -p 6379:6379 redis:alpine"
 fi
 
-# Start Celery worker in background
-echo "🔄 Starting Celery worker..."
-poetry run celery -A celery_app worker --loglevel=info --concurrency=2 &
-CELERY_PID=$!
+# Start Celery workers in background: prefork for MSG parsing, threads for remote calls
+# (both on this host, so they share ATTACHMENT_STAGING_DIR)
+export ATTACHMENT_STAGING_DIR=${ATTACHMENT_STAGING_DIR:-/tmp/reinsurance_attachments}
+echo "🔄 Starting Celery workers..."
+poetry run celery -A celery_app worker --loglevel=info -Q ${CELERY_CPU_QUEUE:-msg_parsing} -P prefork --concurrency=${CELERY_CPU_CONCURRENCY:-2} -n cpu@%h &
+CELERY_CPU_PID=$!
+poetry run celery -A celery_app worker --loglevel=info -Q ${CELERY_IO_QUEUE:-remote_calls},celery -P threads --concurrency=${CELERY_IO_CONCURRENCY:-16} -n io@%h &
+CELERY_IO_PID=$!
 
 # Start FastAPI server
 echo "🚀 Starting FastAPI server..."
@@ -49,7 +53,7 @@ echo ""
 # Function to cleanup on exit
 cleanup() {
     echo "🛑 Stopping all services..."
-    kill $CELERY_PID 2>/dev/null
+    kill $CELERY_CPU_PID $CELERY_IO_PID 2>/dev/null
     if command -v redis-server &> /dev/null; then
         redis-cli shutdown 2>/dev/null
     fi
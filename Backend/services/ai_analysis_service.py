@@ -3,9 +3,14 @@ AI Analysis Service for Facultative Reinsurance Decision Support
 Uses GPT-5-mini with LangChain and Pydantic output parsing
 """
 import os
+import re
 import json
+import time
+import hashlib
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, NamedTuple, Optional, Tuple
 from datetime import datetime
 
 from langchain.schema import HumanMessage, SystemMessage
@@ -20,32 +25,231 @@ from models.reinsurance_models import (
     MarketAnalysis,
     PortfolioImpact,
     ClimateRiskLevel,
-    RiskLevel
+    RiskLevel,
+    WorkingSheetExtract,
+    EXTRACTION_FIELDS
 )
 from services.document_processing_service import DocumentProcessingService
+from services.prompt_builder import PromptBuilder, chunk_text, count_tokens, score_relevance, truncate_to_tokens
+from utils.disk_cache import DiskCache
 
 logger = logging.getLogger(__name__)
 
+# "single": one analysis call; "map_reduce": per-chunk extraction, merge, final
+# reasoning call; "auto": map-reduce when the content exceeds PROMPT_TOKEN_BUDGET
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "auto").lower()
+MAP_CHUNK_TOKENS = int(os.getenv("MAP_CHUNK_TOKENS", "6000"))
+MAP_MAX_CHUNKS = int(os.getenv("MAP_MAX_CHUNKS", "24"))
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "4"))
+
+# Persistent cache of LLM responses keyed by model, system prompt and normalized input
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+
+def get_llm_cache() -> Optional[DiskCache]:
+    """Return the process-wide LLM response cache, or None if disabled or unavailable"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _llm_cache_lock:
+        if _llm_cache is None:
+            try:
+                _llm_cache = DiskCache(
+                    LLM_CACHE_PATH,
+                    max_bytes=LLM_CACHE_MAX_BYTES,
+                    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                    name="llm_cache"
+                )
+            except Exception as e:
+                logger.warning(f"LLM response cache disabled, cannot open {LLM_CACHE_PATH}: {e}")
+                return None
+        return _llm_cache
+
+def _normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+# Numeric values further apart than this are reported as conflicting
+CONFLICT_TOLERANCE = 0.01
+
+EXTRACTION_SYSTEM_PROMPT = """
+You are a facultative reinsurance analyst extracting facts from one part of a submission.
+
+Fill in only the fields that this excerpt states explicitly. Leave every other field null:
+do not estimate, infer or carry over typical market values. Amounts are plain numbers in
+the original currency (no thousands separators); percentages are numbers (35 for 35%).
+
+Respond ONLY with valid JSON that matches the schema.
+"""
+
+ANALYSIS_SYSTEM_PROMPT = """
+You are an expert facultative reinsurance underwriter with 20+ years of experience. 
+
+Analyze the provided reinsurance submission and generate a comprehensive working sheet following the Kenya Re guidelines.
+
+ANALYSIS REQUIREMENTS:
+1. Extract all available information about the insured, cedant, broker, and risk details
+2. Assess perils covered, geographical limits, and risk characteristics
+3. Evaluate financial information including TSI, deductibles, and premium rates
+4. Perform risk assessment including PML estimation and catastrophe exposure
+5. Analyze ESG and climate change risk factors
+6. Provide market considerations and portfolio impact assessment
+7. Generate final recommendations with proposed share percentage
+
+RISK ASSESSMENT GUIDELINES:
+- PML (Possible Maximum Loss): Consider industry standards (usually 10-100% depending on risk type)
+- ESG Risk: Evaluate Environmental, Social, Governance factors (Low/Medium/High)
+- Climate Risk: Assess exposure to climate change (Minimal/Moderate/High)
+- Premium Rates: Calculate based on risk profile and market conditions
+
+DECISION FACTORS:
+- Technical quality of the risk
+- Claims experience and loss history
+- Market conditions and competitor behavior  
+- Portfolio concentration and diversification
+- Regulatory and compliance considerations
+
+Provide specific, actionable recommendations with clear justification.
+Be conservative in risk assessment to protect the reinsurer's interests.
+
+Respond ONLY with valid JSON that matches the AIAnalysisResult schema.
+"""
+
+class StaticPrompt(NamedTuple):
+    """System message shared by every call of one kind, and its version"""
+    system: str
+    version: str
+
+# kind -> (instructions, output schema) for the system message
+_STATIC_PROMPT_SOURCES = {
+    "analysis": (ANALYSIS_SYSTEM_PROMPT, AIAnalysisResult),
+    "extraction": (EXTRACTION_SYSTEM_PROMPT, WorkingSheetExtract),
+}
+
+_static_prompts: Dict[str, StaticPrompt] = {}
+_static_prompts_lock = threading.Lock()
+
+def get_static_prompt(kind: str) -> StaticPrompt:
+    """
+    Return the system message for "analysis" or "extraction" calls
+    
+    The instructions and the parser's format instructions (the JSON schema
+    of the output model, which is expensive to derive) are combined once per
+    process. The message is byte-identical across calls and sent first, so
+    the provider's prompt prefix cache serves it on repeated analyses. The
+    version is a hash of the message and changes with the prompt or schema.
+    """
+    with _static_prompts_lock:
+        prompt = _static_prompts.get(kind)
+        if prompt is None:
+            instructions, model = _STATIC_PROMPT_SOURCES[kind]
+            format_instructions = PydanticOutputParser(pydantic_object=model).get_format_instructions()
+            system = f"{instructions}\n{format_instructions}\n"
+            version = hashlib.sha256(system.encode('utf-8')).hexdigest()[:12]
+            prompt = _static_prompts[kind] = StaticPrompt(system, version)
+            logger.info(f"Built {kind} system prompt version {version} ({count_tokens(system)} tokens)")
+        return prompt
+
+def merge_working_sheet_extracts(
+    extracts: List[Tuple[str, Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], Dict[str, List[Tuple[str, Any]]]]:
+    """
+    Deterministically merge partial working sheets
+    
+    Sources are taken in the order given (email body, then documents in
+    attachment order, then chunk order) and the first source that states a
+    field wins. TSI breakdowns are combined key by key and claims records
+    are concatenated without duplicates. Numeric fields with materially
+    different values in other sources are reported as conflicts.
+    
+    Args:
+        extracts: (source name, extracted fields) pairs in priority order
+        
+    Returns:
+        (merged fields, {field: [(source, value), ...]} for conflicting fields)
+    """
+    merged: Dict[str, Any] = {}
+    sources: Dict[str, List[Tuple[str, Any]]] = {}
+    
+    for source, fields in extracts:
+        for name in EXTRACTION_FIELDS:
+            value = fields.get(name)
+            if value is None or value == "" or value == [] or value == {}:
+                continue
+            sources.setdefault(name, []).append((source, value))
+            
+            if name == "tsi_breakdown":
+                breakdown = merged.setdefault(name, {})
+                for key, amount in value.items():
+                    breakdown.setdefault(key, amount)
+            elif name == "claims_experience_last_3_years":
+                claims = merged.setdefault(name, [])
+                seen = {json.dumps(claim, sort_keys=True, default=str) for claim in claims}
+                for claim in value:
+                    if json.dumps(claim, sort_keys=True, default=str) not in seen:
+                        claims.append(claim)
+            elif name not in merged:
+                merged[name] = value
+    
+    conflicts = {}
+    for name, values in sources.items():
+        numbers = [(source, value) for source, value in values if isinstance(value, (int, float))]
+        if len(numbers) < 2:
+            continue
+        first = numbers[0][1]
+        if any(abs(value - first) > CONFLICT_TOLERANCE * max(abs(value), abs(first)) for _, value in numbers[1:]):
+            conflicts[name] = numbers
+    
+    return merged, conflicts
+
 class AIAnalysisService:
-    def __init__(self):
-        """Initialize the AI analysis service with GPT-5-mini"""
+    def __init__(self, doc_processor: Optional[DocumentProcessingService] = None):
+        """
+        Initialize the AI analysis service with GPT-5-mini
+        
+        Args:
+            doc_processor: Document processing service to share; a new one
+                is created when omitted
+        """
         # Using GPT-5-mini for efficient and cost-effective analysis
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable is required")
         self.llm = ChatOpenAI(
-            model="gpt-5-mini"
+            model="gpt-5-mini",
+            stream_usage=True  # Token usage (incl. prompt cache reads) for streamed responses too
         )
         
-        # Set up output parser
+        # Set up output parsers (full analysis, per-chunk extraction)
         self.parser = PydanticOutputParser(pydantic_object=AIAnalysisResult)
+        self.extraction_parser = PydanticOutputParser(pydantic_object=WorkingSheetExtract)
         
         # Initialize document processing service
-        self.doc_processor = DocumentProcessingService()
+        self.doc_processor = doc_processor or DocumentProcessingService()
+        
+        # Keeps the analysis input within the token budget
+        self.prompt_builder = PromptBuilder()
+        
+        # Responses for identical prompts are reused across requests and restarts
+        self.llm_cache = get_llm_cache()
+        
+        # Schema-derived system prompts are built once per process
+        for kind in _STATIC_PROMPT_SOURCES:
+            get_static_prompt(kind)
         
     def analyze_reinsurance_submission(
         self, 
         email_data: Dict[str, Any], 
-        attachment_urls: Optional[List[str]] = None
+        attachment_urls: Optional[List[str]] = None,
+        attachments: Optional[List[Dict[str, Any]]] = None,
+        parsed_documents: Optional[List[Dict[str, Any]]] = None,
+        use_cache: bool = True,
+        document_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        token_callback: Optional[Callable[[str], None]] = None
     ) -> AIAnalysisResult:
         """
         Comprehensive AI analysis of reinsurance submission
@@ -53,24 +257,47 @@ class AIAnalysisService:
         Args:
             email_data: Extracted email data including sender, subject, body
             attachment_urls: List of Cloudinary URLs for document analysis
+            attachments: Attachment dictionaries with in-memory 'data' bytes;
+                parsed directly and preferred over attachment_urls
+            parsed_documents: Results of DocumentProcessingService.process_attachments
+                or process_documents that the caller already has; used as-is
+                instead of parsing attachments or attachment_urls again
+            use_cache: Reuse cached LLM responses for identical prompts. Pass
+                False to force a fresh analysis (the new responses replace
+                the cached ones)
+            document_callback: Called with each document parsed here as soon
+                as it completes
+            token_callback: Called with each token of the final analysis
+                response as it streams in (not called for cached responses)
             
         Returns:
             Complete AI analysis result with structured recommendations
         """
         try:
-            # Process documents if URLs provided
+            # Process documents if attachments or URLs provided
             document_data = {}
-            if attachment_urls:
+            if parsed_documents is not None:
+                document_data = self.doc_processor.extract_key_information(parsed_documents)
+                logger.info(f"Using {len(parsed_documents)} already parsed documents. Success rate: {document_data.get('processing_summary', {}).get('success_rate', 0):.2%}")
+            elif attachments:
+                logger.info(f"Processing {len(attachments)} attachments with LlamaParse")
+                processed_docs = self.doc_processor.process_attachments(attachments, document_callback=document_callback)
+                document_data = self.doc_processor.extract_key_information(processed_docs)
+                logger.info(f"Document processing completed. Success rate: {document_data.get('processing_summary', {}).get('success_rate', 0):.2%}")
+            elif attachment_urls:
                 logger.info(f"Processing {len(attachment_urls)} documents with LlamaParse")
-                processed_docs = self.doc_processor.process_documents(attachment_urls)
+                processed_docs = self.doc_processor.process_documents(attachment_urls, document_callback=document_callback)
                 document_data = self.doc_processor.extract_key_information(processed_docs)
                 logger.info(f"Document processing completed. Success rate: {document_data.get('processing_summary', {}).get('success_rate', 0):.2%}")
             
+            if self._use_map_reduce(email_data, document_data):
+                return self._analyze_map_reduce(email_data, document_data, use_cache, token_callback)
+            
             # Prepare input data for analysis
             analysis_input = self._prepare_analysis_input(email_data, attachment_urls, document_data)
             
             # Generate AI analysis
-            analysis_result = self._generate_ai_analysis(analysis_input)
+            analysis_result = self._generate_ai_analysis(analysis_input, use_cache, token_callback)
             
             # Validate and return result
             return analysis_result
@@ -81,8 +308,145 @@ class AIAnalysisService:
             return self._create_fallback_analysis(email_data)
     
     def _prepare_analysis_input(self, email_data: Dict[str, Any], attachment_urls: Optional[List[str]] = None, document_data: Optional[Dict[str, Any]] = None) -> str:
-        """Prepare input text for AI analysis"""
+        """
+        Prepare input text for AI analysis
+        
+        The text is kept within PROMPT_TOKEN_BUDGET: document content is
+        chunked and the chunks most relevant to the working sheet (TSI, PML,
+        perils, claims, premium) are included first.
+        """
+        input_text, usage = self.prompt_builder.build(email_data, document_data)
+        
+        documents = usage.get('documents')
+        logger.info(
+            f"Analysis input: {usage['total']}/{usage['budget']} tokens "
+            f"(header {usage['header']}, email body {usage['email_body']}, attachments {usage['attachments']}, "
+            f"tables {usage.get('tables', 0)}, documents {documents['tokens'] if documents else 0}"
+            + (f" from {documents['chunks_selected']}/{documents['chunks_total']} chunks, "
+               f"{documents['tokens_available']} tokens available)" if documents else ")")
+        )
+        
+        return input_text
+    
+    def _use_map_reduce(self, email_data: Dict[str, Any], document_data: Dict[str, Any]) -> bool:
+        """Whether to analyse in two stages (see ANALYSIS_MODE)"""
+        if ANALYSIS_MODE == "single" or not document_data.get('documents'):
+            return False
+        if ANALYSIS_MODE == "map_reduce":
+            return True
+        content_tokens = count_tokens(str(email_data.get('body') or '')) + sum(
+            count_tokens(document.get('text') or '') for document in document_data['documents']
+        )
+        return content_tokens > self.prompt_builder.max_tokens
+    
+    def _analyze_map_reduce(
+        self,
+        email_data: Dict[str, Any],
+        document_data: Dict[str, Any],
+        use_cache: bool = True,
+        token_callback: Optional[Callable[[str], None]] = None
+    ) -> AIAnalysisResult:
+        """
+        Two-stage analysis for large submissions
+        
+        Map: concurrent extraction calls fill partial working sheets from the
+        email body and each document chunk. Reduce: the partial sheets are
+        merged deterministically and one small reasoning call over the merged
+        facts produces the AIAnalysisResult. Falls back to the single-call
+        analysis when no chunk yields any facts.
+        """
+        units = self._map_units(email_data, document_data)
+        started_at = time.perf_counter()
         
+        with ThreadPoolExecutor(max_workers=max(1, min(MAP_CONCURRENCY, len(units))), thread_name_prefix="ai-map") as executor:
+            extracts = list(executor.map(lambda unit: self._extract_unit(unit, use_cache), units))
+        
+        extracts = [(unit['source'], fields) for unit, fields in zip(units, extracts) if fields]
+        logger.info(
+            f"Map stage: {len(extracts)}/{len(units)} chunks yielded facts "
+            f"in {time.perf_counter() - started_at:.1f}s"
+        )
+        
+        if not extracts:
+            logger.warning("Map stage extracted nothing, falling back to single-call analysis")
+            return self._generate_ai_analysis(
+                self._prepare_analysis_input(email_data, None, document_data), use_cache, token_callback
+            )
+        
+        merged, conflicts = merge_working_sheet_extracts(extracts)
+        analysis_result = self._generate_ai_analysis(
+            self._prepare_reduce_input(email_data, document_data, merged, conflicts, extracts),
+            use_cache,
+            token_callback
+        )
+        
+        # Facts stated in the documents take effect even if the final call omitted them.
+        # The sheet is rebuilt through model_validate: attribute assignment would skip validation
+        sheet = analysis_result.working_sheet.model_dump()
+        missing = {name: value for name, value in merged.items() if sheet.get(name) is None}
+        if missing:
+            try:
+                analysis_result.working_sheet = FacultativeReinsuranceWorkingSheet.model_validate({**sheet, **missing})
+            except ValidationError as e:
+                logger.warning(f"Merged facts failed validation, keeping the reduce call's working sheet: {str(e)}")
+        for name, values in conflicts.items():
+            analysis_result.warnings.append(
+                f"Conflicting {name} across documents: " + ", ".join(f"{value} ({source})" for source, value in values)
+            )
+        
+        return analysis_result
+    
+    def _map_units(self, email_data: Dict[str, Any], document_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Split the email body and documents into extraction units
+        
+        When there are more than MAP_MAX_CHUNKS, the email body and the
+        document chunks most relevant to the working sheet are kept.
+        """
+        units = []
+        body = str(email_data.get('body') or '')
+        if body.strip():
+            units.append({"source": "email body", "text": truncate_to_tokens(body, MAP_CHUNK_TOKENS), "score": float('inf')})
+        
+        for i, document in enumerate(document_data.get('documents') or []):
+            name = document.get('name') or f"document {i + 1}"
+            chunks = chunk_text(document.get('text') or '', MAP_CHUNK_TOKENS)
+            for j, chunk in enumerate(chunks):
+                source = name if len(chunks) == 1 else f"{name} (part {j + 1}/{len(chunks)})"
+                units.append({"source": source, "text": chunk, "score": score_relevance(chunk)})
+        
+        if len(units) > MAP_MAX_CHUNKS:
+            keep = set(sorted(range(len(units)), key=lambda i: -units[i]['score'])[:MAP_MAX_CHUNKS])
+            logger.info(f"Map stage: keeping the {MAP_MAX_CHUNKS} most relevant of {len(units)} chunks")
+            units = [unit for i, unit in enumerate(units) if i in keep]
+        
+        return units
+    
+    def _extract_unit(self, unit: Dict[str, Any], use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """Extract working sheet facts from one unit; None when the call fails"""
+        human_prompt = f"""
+Extract working sheet facts from this excerpt of a facultative reinsurance submission.
+
+SOURCE: {unit['source']}
+
+{unit['text']}
+"""
+        try:
+            extract = self._invoke_llm(get_static_prompt("extraction"), human_prompt, self.extraction_parser, use_cache)
+            return extract.model_dump(exclude_none=True)
+        except Exception as e:
+            logger.warning(f"Extraction failed for {unit['source']}: {str(e)}")
+            return None
+    
+    def _prepare_reduce_input(
+        self,
+        email_data: Dict[str, Any],
+        document_data: Dict[str, Any],
+        merged: Dict[str, Any],
+        conflicts: Dict[str, List[Tuple[str, Any]]],
+        extracts: List[Tuple[str, Dict[str, Any]]]
+    ) -> str:
+        """Input for the final reasoning call: merged facts instead of raw documents"""
         input_text = f"""
 FACULTATIVE REINSURANCE SUBMISSION ANALYSIS
 
@@ -91,103 +455,125 @@ EMAIL DETAILS:
 - Subject: {email_data.get('subject', 'No Subject')}
 - Date: {email_data.get('date', 'Unknown')}
 
-EMAIL CONTENT:
-{email_data.get('body', 'No content available')}
-
-ATTACHMENTS:
+EXTRACTED FACTS (merged from {len(extracts)} excerpts of the email and {document_data.get('document_count', 0)} documents; use these values as stated):
+{json.dumps(merged, indent=2, default=str)}
 """
+        if conflicts:
+            input_text += "\nCONFLICTING VALUES (the first one was used; explain the choice in analysis_notes):\n"
+            for name, values in conflicts.items():
+                input_text += f"- {name}: " + ", ".join(f"{value} ({source})" for source, value in values) + "\n"
         
-        if email_data.get('attachments'):
-            for i, attachment in enumerate(email_data['attachments']):
-                input_text += f"- {attachment.get('filename', f'attachment_{i}')} "
-                input_text += f"({attachment.get('size', 0)} bytes)"
-                if attachment.get('cloudinary_url'):
-                    input_text += f" [URL: {attachment['cloudinary_url']}]"
-                input_text += "\n"
-        else:
-            input_text += "No attachments found.\n"
+        input_text += "\nSOURCES:\n"
+        for source, fields in extracts:
+            input_text += f"- {source}: {', '.join(sorted(fields))}\n"
         
-        # Add processed document content
-        if document_data and document_data.get('combined_text'):
-            input_text += f"""
-PROCESSED DOCUMENT CONTENT:
-{document_data['combined_text']}
-
-DOCUMENT PROCESSING SUMMARY:
-- Total documents processed: {document_data.get('document_count', 0)}
-- Success rate: {document_data.get('processing_summary', {}).get('success_rate', 0):.2%}
-- Total text extracted: {document_data.get('total_text_length', 0)} characters
-
-"""
+        logger.info(f"Reduce input: {count_tokens(input_text)} tokens for {len(merged)} merged fields")
+        return input_text
+    
+    def _invoke_llm(
+        self,
+        prompt: StaticPrompt,
+        human_prompt: str,
+        parser: PydanticOutputParser,
+        use_cache: bool = True,
+        token_callback: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Invoke the LLM and parse its response, going through the response cache
+        
+        The cache key covers the model, the system prompt version and the
+        whitespace-normalized input, so any prompt, schema or model change misses.
+        Only responses that parse are cached. With use_cache=False the cache
+        is not read but the fresh response is stored. With a token_callback
+        the response is streamed and each token is passed on as it arrives.
+        """
+        cache_key = None
+        if self.llm_cache is not None:
+            model_name = getattr(self.llm, 'model_name', None) or getattr(self.llm, 'model', 'unknown')
+            input_hash = hashlib.sha256(_normalize_prompt(human_prompt).encode('utf-8')).hexdigest()
+            cache_key = f"{model_name}:{prompt.version}:{input_hash}"
             
-            # Add table information if available
-            if document_data.get('tables'):
-                input_text += "EXTRACTED TABLES:\n"
-                for i, table in enumerate(document_data['tables'][:5]):  # Limit to first 5 tables
-                    input_text += f"Table {i+1}: {str(table)[:500]}...\n"
-                input_text += "\n"
+            if use_cache:
+                cached = self._get_cached_response(cache_key)
+                if cached is not None:
+                    try:
+                        result = parser.parse(cached)
+                        logger.info(f"LLM response served from cache ({cache_key[:40]}...)")
+                        return result
+                    except Exception as e:
+                        logger.warning(f"Discarding unparseable cached LLM response: {str(e)}")
         
-        return input_text
+        # Static system message first so the provider can reuse its cached prefix
+        messages = [
+            SystemMessage(content=prompt.system),
+            HumanMessage(content=human_prompt)
+        ]
+        if token_callback is None:
+            response = self.llm.invoke(messages)
+        else:
+            response = None
+            for chunk in self.llm.stream(messages):
+                response = chunk if response is None else response + chunk
+                if chunk.content and isinstance(chunk.content, str):
+                    try:
+                        token_callback(chunk.content)
+                    except Exception as callback_error:
+                        logger.warning(f"Token callback failed: {callback_error}")
+        self._log_prompt_cache_usage(prompt, response)
+        
+        # Parse the response
+        response_content = response.content if hasattr(response, 'content') else str(response)
+        if not isinstance(response_content, str):
+            response_content = str(response_content)
+        result = parser.parse(response_content)
+        
+        if cache_key is not None:
+            self._store_cached_response(cache_key, response_content)
+        return result
+    
+    def _log_prompt_cache_usage(self, prompt: StaticPrompt, response):
+        """Log how many input tokens the provider served from its prompt cache"""
+        usage = getattr(response, 'usage_metadata', None) or {}
+        cached_tokens = (usage.get('input_token_details') or {}).get('cache_read')
+        if usage.get('input_tokens'):
+            logger.info(
+                f"LLM call (prompt {prompt.version}): {usage['input_tokens']} input tokens, "
+                f"{cached_tokens or 0} from provider prompt cache"
+            )
+    
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        try:
+            return self.llm_cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {str(e)}")
+            return None
+    
+    def _store_cached_response(self, cache_key: str, response_content: str):
+        try:
+            self.llm_cache.set(cache_key, response_content)
+        except Exception as e:
+            logger.warning(f"LLM cache write failed: {str(e)}")
     
-    def _generate_ai_analysis(self, input_text: str) -> AIAnalysisResult:
+    def _generate_ai_analysis(
+        self,
+        input_text: str,
+        use_cache: bool = True,
+        token_callback: Optional[Callable[[str], None]] = None
+    ) -> AIAnalysisResult:
         """Generate AI analysis using GPT-5-mini"""
         
-        system_prompt = """
-You are an expert facultative reinsurance underwriter with 20+ years of experience. 
-
-Analyze the provided reinsurance submission and generate a comprehensive working sheet following the Kenya Re guidelines.
-
-ANALYSIS REQUIREMENTS:
-1. Extract all available information about the insured, cedant, broker, and risk details
-2. Assess perils covered, geographical limits, and risk characteristics
-3. Evaluate financial information including TSI, deductibles, and premium rates
-4. Perform risk assessment including PML estimation and catastrophe exposure
-5. Analyze ESG and climate change risk factors
-6. Provide market considerations and portfolio impact assessment
-7. Generate final recommendations with proposed share percentage
-
-RISK ASSESSMENT GUIDELINES:
-- PML (Possible Maximum Loss): Consider industry standards (usually 10-100% depending on risk type)
-- ESG Risk: Evaluate Environmental, Social, Governance factors (Low/Medium/High)
-- Climate Risk: Assess exposure to climate change (Minimal/Moderate/High)
-- Premium Rates: Calculate based on risk profile and market conditions
-
-DECISION FACTORS:
-- Technical quality of the risk
-- Claims experience and loss history
-- Market conditions and competitor behavior  
-- Portfolio concentration and diversification
-- Regulatory and compliance considerations
-
-Provide specific, actionable recommendations with clear justification.
-Be conservative in risk assessment to protect the reinsurer's interests.
-
-Respond ONLY with valid JSON that matches the AIAnalysisResult schema.
-"""
-
         human_prompt = f"""
 Analyze this facultative reinsurance submission:
 
 {input_text}
 
 Based on the information provided, generate a complete analysis following the facultative reinsurance working sheet format.
-
-{self.parser.get_format_instructions()}
 """
 
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=human_prompt)
-            ]
-            
-            response = self.llm.invoke(messages)
-            
-            # Parse the response
-            response_content = response.content if hasattr(response, 'content') else str(response)
-            if not isinstance(response_content, str):
-                response_content = str(response_content)
-            analysis_result = self.parser.parse(response_content)
+            analysis_result = self._invoke_llm(
+                get_static_prompt("analysis"), human_prompt, self.parser, use_cache, token_callback
+            )
             
             logger.info("AI analysis completed successfully")
             return analysis_result
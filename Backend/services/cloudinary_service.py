@@ -2,14 +2,100 @@
 Cloudinary service for uploading reinsurance document attachments
 """
 import os
+import time
+import hashlib
+import random
 import logging
+import mimetypes
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Dict, Any, Optional
 import cloudinary
 import cloudinary.uploader
+import cloudinary.utils
+from cloudinary.exceptions import Error as CloudinaryError, GeneralError, RateLimited
 from io import BytesIO
 
+from utils.disk_cache import DiskCache
+
 logger = logging.getLogger(__name__)
 
+# Concurrent uploads and retry policy
+UPLOAD_CONCURRENCY = int(os.getenv("CLOUDINARY_UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_RETRIES = int(os.getenv("CLOUDINARY_UPLOAD_RETRIES", "3"))
+UPLOAD_RETRY_BASE_DELAY = float(os.getenv("CLOUDINARY_RETRY_BASE_DELAY_SECONDS", "0.5"))
+UPLOAD_TIMEOUT = float(os.getenv("CLOUDINARY_UPLOAD_TIMEOUT_SECONDS", "60"))
+
+# Messages cloudinary.uploader uses for transport failures and non-JSON 5xx replies
+RETRYABLE_ERROR_PREFIXES = ("Unexpected error", "Socket error", "Error parsing server response (5")
+
+# Background uploads for archiving attachments while analysis runs
+_archive_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CLOUDINARY_ARCHIVE_WORKERS", "2")),
+    thread_name_prefix="cloudinary-archive"
+)
+
+# Local index of blobs already stored in Cloudinary, keyed by content digest
+UPLOAD_INDEX_ENABLED = os.getenv("CLOUDINARY_INDEX_ENABLED", "true").lower() == "true"
+UPLOAD_INDEX_PATH = os.getenv("CLOUDINARY_INDEX_PATH", os.path.join(".cache", "cloudinary_index.sqlite"))
+
+_upload_index = None
+_upload_index_lock = threading.Lock()
+
+def get_upload_index() -> Optional[DiskCache]:
+    """Return the process-wide upload index, or None if disabled or unavailable"""
+    global _upload_index
+    if not UPLOAD_INDEX_ENABLED:
+        return None
+    with _upload_index_lock:
+        if _upload_index is None:
+            try:
+                _upload_index = DiskCache(UPLOAD_INDEX_PATH, name="cloudinary_index")
+            except Exception as e:
+                logger.warning(f"Cloudinary upload index disabled, cannot open {UPLOAD_INDEX_PATH}: {e}")
+                return None
+        return _upload_index
+
+_http_pool_lock = threading.Lock()
+_http_pool_configured = False
+
+def _configure_shared_http_pool():
+    """
+    Size the uploader's keep-alive connection pool for concurrent uploads
+    
+    cloudinary.uploader sends every request through one module-level urllib3
+    pool manager, which by default keeps a single connection per host.
+    Replacing it with a pool of UPLOAD_CONCURRENCY connections lets parallel
+    uploads reuse warm TLS connections instead of opening and discarding them.
+    """
+    global _http_pool_configured
+    with _http_pool_lock:
+        if _http_pool_configured or not hasattr(cloudinary.uploader, "_http"):
+            return
+        options = dict(cloudinary.CERT_KWARGS, maxsize=max(1, UPLOAD_CONCURRENCY), block=True)
+        cloudinary.uploader._http = cloudinary.utils.get_http_connector(cloudinary.config(), options)
+        _http_pool_configured = True
+
+def _is_retryable(error: Exception) -> bool:
+    """5xx responses, rate limiting, timeouts and connection errors are worth retrying"""
+    if isinstance(error, (GeneralError, RateLimited)):
+        return True
+    return isinstance(error, CloudinaryError) and str(error).startswith(RETRYABLE_ERROR_PREFIXES)
+
+def _public_id(digest: str, filename: str) -> str:
+    """
+    Content-addressed public_id for an upload
+
+    Cloudinary's auto detection stores images, PDFs and video/audio with a
+    format that it appends to the URL. Anything else is a raw asset whose URL
+    is the bare public_id, so the original extension is kept in it.
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+    mime_type = mimetypes.guess_type(f"file{ext}")[0] or ""
+    if not ext or ext == ".pdf" or mime_type.startswith(("image/", "video/", "audio/")):
+        return digest
+    return f"{digest}{ext}"
+
 class CloudinaryService:
     def __init__(self):
         """Initialize Cloudinary with environment variables"""
@@ -18,80 +104,160 @@ class CloudinaryService:
             api_key=os.getenv('CLOUDINARY_API_KEY'),
             api_secret=os.getenv('CLOUDINARY_API_SECRET')
         )
-        
+        _configure_shared_http_pool()
+        self.upload_index = get_upload_index()
+    
     def upload_attachment(self, file_data: bytes, filename: str, folder: str = "reinsurance_docs") -> Dict[str, Any]:
         """
         Upload attachment file to Cloudinary
         
+        The public_id is the SHA-256 digest of the content (plus the file
+        extension for raw files), so identical bytes map to the same asset
+        from every worker. Blobs already recorded in the
+        local upload index are not uploaded again. Transient failures (5xx,
+        rate limiting, timeouts) are retried with exponential backoff and full
+        jitter.
+        
         Args:
             file_data: Binary file data
             filename: Original filename
             folder: Cloudinary folder to upload to
-            
+        
         Returns:
             Dictionary with upload result including public_id and secure_url
         """
-        try:
-            # Create a file-like object from bytes
-            file_stream = BytesIO(file_data)
+        public_id = _public_id(hashlib.sha256(file_data).hexdigest(), filename)
+        index_key = f"{folder}/{public_id}"
+        
+        known = self._lookup_uploaded(index_key)
+        if known is not None:
+            logger.info(f"{filename} already stored in Cloudinary as {known.get('public_id')}, skipping upload")
+            return {**known, "attempts": 0, "cached": True}
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                # Create a file-like object from bytes
+                file_stream = BytesIO(file_data)
+                
+                # Upload to Cloudinary with public access
+                result = cloudinary.uploader.upload(
+                    file_stream,
+                    folder=folder,
+                    public_id=public_id,  # Content-addressed, stable across processes
+                    resource_type="auto",  # Auto-detect file type
+                    overwrite=False,
+                    access_mode="public",  # Ensure public access for document processing
+                    timeout=UPLOAD_TIMEOUT
+                )
+                
+                logger.info(f"Successfully uploaded {filename} to Cloudinary")
+                
+                upload_result = {
+                    "public_id": result.get("public_id"),
+                    "secure_url": result.get("secure_url"),
+                    "format": result.get("format"),
+                    "resource_type": result.get("resource_type"),
+                    "bytes": result.get("bytes"),
+                    "width": result.get("width"),
+                    "height": result.get("height")
+                }
+                self._record_uploaded(index_key, upload_result)
+                
+                return {**upload_result, "attempts": attempt, "cached": False}
             
-            # Upload to Cloudinary with public access
-            result = cloudinary.uploader.upload(
-                file_stream,
-                folder=folder,
-                public_id=f"{filename}_{hash(file_data)}",
-                resource_type="auto",  # Auto-detect file type
-                overwrite=True,
-                use_filename=True,
-                unique_filename=True,
-                access_mode="public"  # Ensure public access for document processing
+            except Exception as e:
+                if attempt <= UPLOAD_MAX_RETRIES and _is_retryable(e):
+                    delay = random.uniform(0, UPLOAD_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+                    logger.warning(f"Upload of {filename} failed (attempt {attempt}), retrying in {delay:.2f}s: {str(e)}")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Failed to upload {filename} to Cloudinary: {str(e)}")
+                raise Exception(f"Cloudinary upload failed: {str(e)}")
+    
+    def _lookup_uploaded(self, index_key: str) -> Optional[Dict[str, Any]]:
+        if self.upload_index is None:
+            return None
+        try:
+            return self.upload_index.get(index_key)
+        except Exception as e:
+            logger.warning(f"Cloudinary upload index lookup failed: {str(e)}")
+            return None
+    
+    def _record_uploaded(self, index_key: str, upload_result: Dict[str, Any]):
+        if self.upload_index is None or not upload_result.get("secure_url"):
+            return
+        try:
+            self.upload_index.set(index_key, upload_result)
+        except Exception as e:
+            logger.warning(f"Cloudinary upload index write failed: {str(e)}")
+    
+    def upload_multiple_attachments(self, attachments: list, max_concurrency: Optional[int] = None) -> list:
+        """
+        Upload multiple attachments to Cloudinary
+        
+        Attachments are uploaded concurrently over the shared connection pool.
+        
+        Args:
+            attachments: List of attachment dictionaries with 'data' and 'filename'
+            max_concurrency: Parallel uploads (defaults to CLOUDINARY_UPLOAD_CONCURRENCY)
+        
+        Returns:
+            List of upload results, in the same order as attachments, each
+            with the per-file latency in milliseconds
+        """
+        concurrency = min(max_concurrency or UPLOAD_CONCURRENCY, len(attachments))
+        started_at = time.perf_counter()
+        
+        if concurrency <= 1:
+            results = [self._upload_with_timing(attachment) for attachment in attachments]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="cloudinary-upload") as executor:
+                futures = [executor.submit(self._upload_with_timing, attachment) for attachment in attachments]
+                results = [future.result() for future in futures]
+        
+        if results:
+            total_ms = (time.perf_counter() - started_at) * 1000
+            timings = ", ".join(f"{r['original_filename']}={r['latency_ms']}ms" for r in results)
+            logger.info(f"Uploaded {len(results)} attachments in {total_ms:.0f}ms ({timings})")
+        
+        return results
+    
+    def _upload_with_timing(self, attachment: Dict[str, Any]) -> Dict[str, Any]:
+        """Upload one attachment and record how long it took"""
+        started_at = time.perf_counter()
+        try:
+            result = self.upload_attachment(
+                file_data=attachment['data'],
+                filename=attachment['filename']
             )
-            
-            logger.info(f"Successfully uploaded {filename} to Cloudinary")
-            
             return {
-                "public_id": result.get("public_id"),
-                "secure_url": result.get("secure_url"),
-                "format": result.get("format"),
-                "resource_type": result.get("resource_type"),
-                "bytes": result.get("bytes"),
-                "width": result.get("width"),
-                "height": result.get("height")
+                "original_filename": attachment['filename'],
+                "upload_result": result,
+                "status": "success",
+                "latency_ms": round((time.perf_counter() - started_at) * 1000, 1)
             }
-            
         except Exception as e:
-            logger.error(f"Failed to upload {filename} to Cloudinary: {str(e)}")
-            raise Exception(f"Cloudinary upload failed: {str(e)}")
+            logger.error(f"Failed to upload {attachment['filename']}: {str(e)}")
+            return {
+                "original_filename": attachment['filename'],
+                "error": str(e),
+                "status": "failed",
+                "latency_ms": round((time.perf_counter() - started_at) * 1000, 1)
+            }
     
-    def upload_multiple_attachments(self, attachments: list) -> list:
+    def upload_multiple_attachments_in_background(self, attachments: list) -> Future:
         """
-        Upload multiple attachments to Cloudinary
+        Start uploading attachments to Cloudinary without waiting for the result
+        
+        Used to archive attachments in parallel with document analysis, which
+        works from the in-memory attachment bytes instead of Cloudinary URLs.
         
         Args:
             attachments: List of attachment dictionaries with 'data' and 'filename'
-            
+        
         Returns:
-            List of upload results
+            Future resolving to the same list as upload_multiple_attachments
         """
-        results = []
-        
-        for attachment in attachments:
-            try:
-                result = self.upload_attachment(
-                    file_data=attachment['data'],
-                    filename=attachment['filename']
-                )
-                results.append({
-                    "original_filename": attachment['filename'],
-                    "upload_result": result,
-                    "status": "success"
-                })
-            except Exception as e:
-                logger.error(f"Failed to upload {attachment['filename']}: {str(e)}")
-                results.append({
-                    "original_filename": attachment['filename'],
-                    "error": str(e),
-                    "status": "failed"
-                })
-                
-        return results
\ No newline at end of file
+        return _archive_executor.submit(self.upload_multiple_attachments, attachments)
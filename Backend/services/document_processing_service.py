@@ -3,28 +3,23 @@ Document Processing Service using LlamaParse
 Extracts structured text, tables, and images from reinsurance documents
 """
 import os
+import hashlib
 import logging
-import tempfile
+import mimetypes
+import threading
 import requests
-from typing import Dict, Any, List, Optional
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from typing import Callable, Dict, Any, List, Optional
 from llama_parse import LlamaParse
 
+from utils.disk_cache import DiskCache
+from utils.rate_limiter import RateLimiter
+
 logger = logging.getLogger(__name__)
 
-class DocumentProcessingService:
-    def __init__(self):
-        """Initialize LlamaParse with API key"""
-        self.api_key = os.getenv('LLAMA_CLOUD_API_KEY')
-        if not self.api_key:
-            logger.warning("LLAMA_CLOUD_API_KEY not found, document parsing will be limited")
-            self.parser = None
-        else:
-            from llama_parse import ResultType
-            self.parser = LlamaParse(
-                api_key=self.api_key,
-                result_type=ResultType.MD,  # Get structured markdown output
-                language="en",
-                parsing_instruction="""
+PARSING_INSTRUCTION = """
                 This document contains reinsurance submission information. 
                 Please extract:
                 1. Company and contact information
@@ -38,36 +33,164 @@ class DocumentProcessingService:
                 Preserve all numerical values, percentages, dates, and financial figures exactly.
                 Maintain table structure where possible.
                 """
+
+# Cached parses are only reused for the same parser configuration
+PARSER_VERSION = hashlib.sha256(f"md|en|{PARSING_INSTRUCTION}".encode("utf-8")).hexdigest()[:12]
+
+# Persistent cache of LlamaParse results keyed by document content
+PARSE_CACHE_ENABLED = os.getenv("PARSE_CACHE_ENABLED", "true").lower() == "true"
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", os.path.join(".cache", "llamaparse_cache.sqlite"))
+PARSE_CACHE_MAX_BYTES = int(float(os.getenv("PARSE_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+# Concurrent parsing: per-submission cap and a process-wide request rate limit
+DOC_PARSE_CONCURRENCY = int(os.getenv("DOC_PARSE_CONCURRENCY", "4"))
+parse_rate_limiter = RateLimiter(
+    rate_per_minute=float(os.getenv("LLAMAPARSE_REQUESTS_PER_MINUTE", "60")),
+    burst=DOC_PARSE_CONCURRENCY,
+    name="llamaparse"
+)
+
+_parse_cache = None
+_parse_cache_lock = threading.Lock()
+
+def get_parse_cache() -> Optional[DiskCache]:
+    """Return the process-wide parse cache, or None if disabled or unavailable"""
+    global _parse_cache
+    if not PARSE_CACHE_ENABLED:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            try:
+                _parse_cache = DiskCache(PARSE_CACHE_PATH, max_bytes=PARSE_CACHE_MAX_BYTES, name="parse_cache")
+            except Exception as e:
+                logger.warning(f"LlamaParse cache disabled, cannot open {PARSE_CACHE_PATH}: {e}")
+                return None
+        return _parse_cache
+
+# Keep-alive connections for document downloads, shared by all parsing threads
+_http_session = requests.Session()
+_http_session.mount("https://", HTTPAdapter(pool_maxsize=max(1, DOC_PARSE_CONCURRENCY)))
+_http_session.mount("http://", HTTPAdapter(pool_maxsize=max(1, DOC_PARSE_CONCURRENCY)))
+
+class DocumentProcessingService:
+    def __init__(self):
+        """Initialize LlamaParse with API key"""
+        self.api_key = os.getenv('LLAMA_CLOUD_API_KEY')
+        if not self.api_key:
+            logger.warning("LLAMA_CLOUD_API_KEY not found, document parsing will be limited")
+            self.parser = None
+        else:
+            from llama_parse import ResultType
+            self.parser = LlamaParse(
+                api_key=self.api_key,
+                result_type=ResultType.MD,  # Get structured markdown output
+                language="en",
+                parsing_instruction=PARSING_INSTRUCTION,
+                # Raise on failed parses so they take the fallback path instead of returning []
+                ignore_errors=False
             )
+        
+        self.cache = get_parse_cache()
     
-    def process_documents(self, cloudinary_urls: List[str]) -> List[Dict[str, Any]]:
+    def process_documents(
+        self,
+        cloudinary_urls: List[str],
+        max_concurrency: Optional[int] = None,
+        document_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Process multiple documents from Cloudinary URLs
         
+        Documents are parsed concurrently (up to max_concurrency at a time)
+        while all workers share the process-wide LlamaParse rate limit.
+        
         Args:
             cloudinary_urls: List of Cloudinary URLs to process
+            max_concurrency: Per-call parse concurrency (defaults to DOC_PARSE_CONCURRENCY)
+            document_callback: Optional callable receiving each result as soon
+                as that document is done (called from the worker threads)
             
         Returns:
-            List of processed document data
+            List of processed document data, in the same order as the URLs
         """
-        results = []
+        return self._process_concurrently(
+            self.process_single_document,
+            cloudinary_urls,
+            lambda url: {"url": url},
+            max_concurrency,
+            document_callback
+        )
+    
+    def process_attachments(
+        self,
+        attachments: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        document_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process multiple attachments directly from their in-memory bytes
+        
+        Avoids the upload/download round trip through Cloudinary.
+        
+        Args:
+            attachments: List of attachment dictionaries with 'data' and 'filename'
+            max_concurrency: Per-call parse concurrency (defaults to DOC_PARSE_CONCURRENCY)
+            document_callback: Optional callable receiving each result as soon
+                as that document is done (called from the worker threads)
+            
+        Returns:
+            List of processed document data, in the same order as the attachments
+        """
+        return self._process_concurrently(
+            self.process_attachment,
+            attachments,
+            lambda attachment: {"url": attachment.get('cloudinary_url'), "filename": attachment.get('filename')},
+            max_concurrency,
+            document_callback
+        )
+    
+    def _process_concurrently(
+        self,
+        process,
+        items: List[Any],
+        describe,
+        max_concurrency: Optional[int] = None,
+        document_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run process over items on a bounded thread pool, preserving order
         
-        for url in cloudinary_urls:
+        Any error is turned into a failed result for that item only.
+        """
+        def process_safely(item):
             try:
-                doc_result = self.process_single_document(url)
-                results.append(doc_result)
+                result = process(item)
             except Exception as e:
-                logger.error(f"Failed to process document {url}: {str(e)}")
-                results.append({
-                    "url": url,
+                source = describe(item)
+                logger.error(f"Failed to process document {source.get('filename') or source.get('url')}: {str(e)}")
+                result = {
+                    **source,
                     "status": "failed",
                     "error": str(e),
                     "extracted_text": "",
                     "tables": [],
                     "metadata": {}
-                })
+                }
+            if document_callback:
+                try:
+                    document_callback(result)
+                except Exception as callback_error:
+                    logger.warning(f"Document callback failed: {callback_error}")
+            return result
         
-        return results
+        concurrency = min(max_concurrency or DOC_PARSE_CONCURRENCY, len(items))
+        
+        if concurrency <= 1:
+            return [process_safely(item) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="doc-parse") as executor:
+            futures = [executor.submit(process_safely, item) for item in items]
+            return [future.result() for future in futures]
     
     def process_single_document(self, cloudinary_url: str) -> Dict[str, Any]:
         """
@@ -84,7 +207,7 @@ class DocumentProcessingService:
                 return self._fallback_processing(cloudinary_url)
             
             # Download the document temporarily
-            response = requests.get(cloudinary_url, timeout=30)
+            response = _http_session.get(cloudinary_url, timeout=30)
             
             # Handle 401 unauthorized errors specifically
             if response.status_code == 401:
@@ -100,66 +223,137 @@ class DocumentProcessingService:
             
             response.raise_for_status()
             
-            # Save to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-                temp_file.write(response.content)
-                temp_file_path = temp_file.name
-            
-            try:
-                # Parse with LlamaParse
-                documents = self.parser.load_data(temp_file_path)
-                
-                # Extract content
-                extracted_text = ""
-                tables = []
-                
-                for doc in documents:
-                    extracted_text += doc.text + "\n\n"
-                    
-                    # Try to extract tables (basic implementation)
-                    if hasattr(doc, 'metadata') and doc.metadata:
-                        if 'tables' in doc.metadata:
-                            tables.extend(doc.metadata['tables'])
-                
-                # Clean up
-                os.unlink(temp_file_path)
-                
-                return {
-                    "url": cloudinary_url,
-                    "status": "success",
-                    "extracted_text": extracted_text.strip(),
-                    "tables": tables,
-                    "metadata": {
-                        "document_count": len(documents),
-                        "total_characters": len(extracted_text),
-                        "processing_method": "llamaparse"
-                    }
-                }
-                
-            except Exception as parse_error:
-                # Clean up temp file
-                if os.path.exists(temp_file_path):
-                    os.unlink(temp_file_path)
-                raise parse_error
+            # LlamaParse detects the type from the extension. Uploads keep it in the URL;
+            # for older extensionless URLs, go by the Content-Type and assume PDF last
+            file_name = os.path.basename(urlparse(cloudinary_url).path) or "document"
+            if not os.path.splitext(file_name)[1]:
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+                ext = mimetypes.guess_extension(content_type) if content_type != "application/octet-stream" else None
+                file_name += ext or ".pdf"
+            return self._parse_content(response.content, file_name, {"url": cloudinary_url})
                 
         except Exception as e:
             logger.error(f"Error processing document {cloudinary_url}: {str(e)}")
             return self._fallback_processing(cloudinary_url)
     
-    def _fallback_processing(self, cloudinary_url: str) -> Dict[str, Any]:
+    def process_attachment(self, attachment: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Fallback processing when LlamaParse is not available
+        Process a single attachment from its in-memory bytes
+        
+        Args:
+            attachment: Attachment dictionary with 'data' (bytes) and 'filename'
+            
+        Returns:
+            Processed document data
         """
+        filename = attachment.get('filename') or 'attachment'
+        source = {"url": attachment.get('cloudinary_url'), "filename": filename}
+        try:
+            if not self.parser:
+                return self._fallback_processing(filename=filename)
+            
+            return self._parse_content(bytes(attachment['data']), filename, source)
+            
+        except Exception as e:
+            logger.error(f"Error processing attachment {filename}: {str(e)}")
+            return self._fallback_processing(filename=filename)
+    
+    def _parse_content(self, content: bytes, file_name: str, source: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse document bytes with LlamaParse, reusing cached results
+        
+        Args:
+            content: Raw document bytes
+            file_name: File name used by LlamaParse to detect the document type
+            source: Identifying fields (url, filename) copied into the result
+        """
+        # Reuse an earlier parse of identical content
+        cache_key = f"{hashlib.sha256(content).hexdigest()}:{PARSER_VERSION}"
+        cached = self._get_cached_parse(cache_key)
+        if cached is not None:
+            logger.info(f"LlamaParse cache hit for {file_name}")
+            return self._build_parse_result(source, cached, cache_hit=True)
+        
+        # Parse with LlamaParse, respecting the shared rate limit
+        parse_rate_limiter.acquire()
+        documents = self.parser.load_data(content, extra_info={"file_name": file_name})
+        
+        # Extract content
+        extracted_text = ""
+        tables = []
+        
+        for doc in documents:
+            extracted_text += doc.text + "\n\n"
+            
+            # Try to extract tables (basic implementation)
+            if hasattr(doc, 'metadata') and doc.metadata:
+                if 'tables' in doc.metadata:
+                    tables.extend(doc.metadata['tables'])
+        
+        parsed = {
+            "extracted_text": extracted_text.strip(),
+            "tables": tables,
+            "document_count": len(documents),
+            "total_characters": len(extracted_text)
+        }
+        if parsed["extracted_text"]:
+            self._store_cached_parse(cache_key, parsed)
+        else:
+            # Never cache an empty parse: the cache has no TTL, so it would stick to this content
+            logger.warning(f"LlamaParse returned no text for {file_name}, result not cached")
+        
+        return self._build_parse_result(source, parsed)
+    
+    def _build_parse_result(self, source: Dict[str, Any], parsed: Dict[str, Any], cache_hit: bool = False) -> Dict[str, Any]:
+        """Build a processed document result from parsed content"""
         return {
+            **source,
+            "status": "success",
+            "extracted_text": parsed["extracted_text"],
+            "tables": parsed["tables"],
+            "metadata": {
+                "document_count": parsed["document_count"],
+                "total_characters": parsed["total_characters"],
+                "processing_method": "llamaparse",
+                "cache_hit": cache_hit
+            }
+        }
+    
+    def _get_cached_parse(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(cache_key)
+        except Exception as e:
+            logger.warning(f"LlamaParse cache lookup failed: {str(e)}")
+            return None
+    
+    def _store_cached_parse(self, cache_key: str, parsed: Dict[str, Any]):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(cache_key, parsed)
+        except Exception as e:
+            logger.warning(f"LlamaParse cache write failed: {str(e)}")
+    
+    def _fallback_processing(self, cloudinary_url: Optional[str] = None, filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Fallback processing when LlamaParse is not available
+        """
+        location = f"Document available at: {cloudinary_url}" if cloudinary_url else f"Document attached as: {filename}"
+        result = {
             "url": cloudinary_url,
             "status": "limited",
-            "extracted_text": f"Document available at: {cloudinary_url}\n[LlamaParse not available - manual review required]",
+            "extracted_text": f"{location}\n[LlamaParse not available - manual review required]",
             "tables": [],
             "metadata": {
                 "processing_method": "fallback",
                 "note": "Limited processing - manual review recommended"
             }
         }
+        if filename:
+            result["filename"] = filename
+        return result
     
     def extract_key_information(self, processed_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
@@ -173,15 +367,21 @@ class DocumentProcessingService:
         """
         combined_text = ""
         all_tables = []
+        documents = []
         
         for doc in processed_docs:
             if doc.get("status") in ["success", "limited"]:
                 combined_text += doc.get("extracted_text", "") + "\n\n"
                 all_tables.extend(doc.get("tables", []))
+                documents.append({
+                    "name": doc.get("filename") or doc.get("url"),
+                    "text": doc.get("extracted_text", "")
+                })
         
         # Basic information extraction (can be enhanced with NLP)
         key_info = {
             "combined_text": combined_text,
+            "documents": documents,
             "tables": all_tables,
             "document_count": len(processed_docs),
             "total_text_length": len(combined_text),
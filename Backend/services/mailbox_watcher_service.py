@@ -0,0 +1,327 @@
+"""
+Mailbox watcher that enqueues new or changed .msg files for analysis
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.disk_cache import DiskCache
+from utils.file_hash import hash_file
+
+try:
+    import watchfiles
+except ImportError:  # pragma: no cover - installed with uvicorn[standard]
+    watchfiles = None
+
+logger = logging.getLogger(__name__)
+
+WATCH_INDEX_PATH = os.getenv("WATCH_INDEX_PATH", os.path.join(".cache", "mailbox_index.sqlite"))
+WATCH_STAGING_DIR = os.getenv("WATCH_STAGING_DIR") or os.path.join(tempfile.gettempdir(), "mailbox_watcher")
+WATCH_SETTLE_SECONDS = float(os.getenv("WATCH_SETTLE_SECONDS", "2"))
+WATCH_BATCH_SIZE = int(os.getenv("WATCH_BATCH_SIZE", "20"))
+WATCH_POLL_INTERVAL_SECONDS = float(os.getenv("WATCH_POLL_INTERVAL_SECONDS", "5"))
+WATCH_FORCE_POLLING = os.getenv("WATCH_FORCE_POLLING", "false").lower() == "true"
+# How long an enqueued task that has not started (Celery PENDING) still counts as in flight
+WATCH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("WATCH_QUEUE_TIMEOUT_SECONDS", "1800"))
+
+# Task states whose content is analysed (or being analysed) and need not be re-enqueued
+IN_FLIGHT_STATES = ('STARTED', 'RETRY', 'PROGRESS')
+
+
+def is_candidate(path: str) -> bool:
+    """.msg files, ignoring Outlook lock files and hidden/partial names"""
+    name = os.path.basename(path)
+    return name.lower().endswith('.msg') and not name.startswith(('~$', '.'))
+
+
+def enqueue_with_celery(paths: List[str]) -> List[str]:
+    """
+    Enqueue the analysis pipeline for each path as one Celery group
+
+    The group is published over a single broker connection.
+
+    Returns:
+        Task IDs, in the same order as paths
+    """
+    from celery import group
+    from celery_app import analysis_pipeline
+
+    result = group(analysis_pipeline(path) for path in paths).apply_async()
+    return [child.id for child in result.results]
+
+
+def celery_task_state(task_id: str) -> str:
+    """Current Celery state of task_id (PENDING for unknown or expired IDs)"""
+    from celery.result import AsyncResult
+    from celery_app import celery_app
+
+    return AsyncResult(task_id, app=celery_app).state
+
+
+class MailboxWatcher:
+    """
+    Watches a drop directory and enqueues only new or changed .msg files
+
+    A persistent index maps each path to the size, mtime and content hash
+    last enqueued, and each content hash to its task, so restarts and
+    renamed or re-saved copies do not trigger new analyses. A content hash
+    only counts as known while its task succeeded or is in flight: content
+    whose task failed, or stayed unstarted past queue_timeout, is enqueued
+    again. Files are only
+    picked up once their size and mtime have been stable for settle_seconds,
+    so partially written files are never enqueued.
+
+    The task deletes the file it is given, so each file is hard-linked (or
+    copied) into staging_dir and the staged path is enqueued. staging_dir
+    must be readable by the Celery workers.
+    """
+
+    def __init__(
+        self,
+        watch_dir: str,
+        index_path: str = WATCH_INDEX_PATH,
+        staging_dir: str = WATCH_STAGING_DIR,
+        settle_seconds: float = WATCH_SETTLE_SECONDS,
+        batch_size: int = WATCH_BATCH_SIZE,
+        poll_interval: float = WATCH_POLL_INTERVAL_SECONDS,
+        force_polling: bool = WATCH_FORCE_POLLING,
+        queue_timeout: float = WATCH_QUEUE_TIMEOUT_SECONDS,
+        enqueue: Callable[[List[str]], List[str]] = enqueue_with_celery,
+        task_state: Callable[[str], str] = celery_task_state
+    ):
+        self.watch_dir = os.path.abspath(watch_dir)
+        self.staging_dir = staging_dir
+        self.settle_seconds = settle_seconds
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.queue_timeout = queue_timeout
+        self.enqueue = enqueue
+        self.task_state = task_state
+        self.index = DiskCache(index_path, name="mailbox_index")
+
+        # path -> (size, mtime_ns, stable_since) for files waiting to settle
+        self._pending: Dict[str, Tuple[int, int, float]] = {}
+        self.stats = {
+            "enqueued": 0,
+            "duplicates": 0,
+            "reenqueued": 0,
+            "batches": 0,
+            "enqueue_failures": 0,
+        }
+
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def scan(self):
+        """Queue every new or changed file in the drop directory (startup and polling)"""
+        for root, _, files in os.walk(self.watch_dir):
+            for name in files:
+                self.observe(os.path.join(root, name))
+
+    def observe(self, path: str):
+        """Note a created or modified file; unchanged, indexed files are ignored"""
+        if not is_candidate(path):
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._pending.pop(path, None)
+            return
+
+        pending = self._pending.get(path)
+        if pending is not None:
+            if pending[:2] != (stat.st_size, stat.st_mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+            return
+
+        # Read-only lookup: scanning unchanged files must not write to the index
+        known = self.index.get(f"path:{path}", touch=False)
+        if known and (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return
+        self._pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def process_ready(self) -> int:
+        """
+        Enqueue pending files whose size and mtime have settled
+
+        Returns:
+            Number of files enqueued
+        """
+        now = time.monotonic()
+        ready = []
+        for path, (size, mtime_ns, stable_since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                # Still being written
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif now - stable_since >= self.settle_seconds:
+                ready.append((path, stat))
+
+        enqueued = 0
+        for start in range(0, len(ready), self.batch_size):
+            enqueued += self._enqueue_batch(ready[start:start + self.batch_size])
+        return enqueued
+
+    def _known_task(self, digest: str) -> Optional[Dict]:
+        """
+        Index entry of the task that analysed digest, or None if it should be re-enqueued
+        """
+        known = self.index.get(f"sha256:{digest}", touch=False)
+        if known is None:
+            return None
+        if known.get("succeeded"):
+            return known
+
+        try:
+            state = self.task_state(known["task_id"])
+        except Exception as e:
+            # Cannot tell; keep treating it as known rather than re-enqueueing blindly
+            logger.warning(f"Cannot get state of task {known['task_id']}: {e}")
+            return known
+
+        if state == 'SUCCESS':
+            # Results expire, so remember the outcome
+            known["succeeded"] = True
+            self.index.set(f"sha256:{digest}", known)
+            return known
+        if state in IN_FLIGHT_STATES:
+            return known
+        if state == 'PENDING' and time.time() - known.get("enqueued_at", 0) < self.queue_timeout:
+            # Still queued (Celery also reports PENDING for lost tasks, hence the timeout)
+            return known
+
+        logger.info(f"Task {known['task_id']} for {known['path']} is {state}, content will be enqueued again")
+        self.stats["reenqueued"] += 1
+        return None
+
+    def _enqueue_batch(self, batch) -> int:
+        staged = []
+        # digest -> files in this batch with the same content as a staged file
+        batch_duplicates: Dict[str, List[Tuple[str, os.stat_result]]] = {}
+        for path, stat in batch:
+            try:
+                digest = hash_file(path)
+            except OSError as e:
+                logger.warning(f"Cannot read {path}, will retry: {e}")
+                continue
+
+            if digest in batch_duplicates:
+                batch_duplicates[digest].append((path, stat))
+                continue
+
+            known = self._known_task(digest)
+            if known is not None:
+                # Touched, renamed or copied file with content already analysed
+                self._record(path, stat, digest, known["task_id"])
+                self._pending.pop(path, None)
+                self.stats["duplicates"] += 1
+                logger.info(f"{path} has the same content as {known['path']}, not enqueued")
+                continue
+
+            batch_duplicates[digest] = []
+            staged.append((path, stat, digest, self._stage(path, digest)))
+
+        if not staged:
+            return 0
+
+        try:
+            task_ids = self.enqueue([staged_path for _, _, _, staged_path in staged])
+        except Exception as e:
+            # Left pending, retried on the next pass
+            self.stats["enqueue_failures"] += 1
+            logger.error(f"Failed to enqueue {len(staged)} files: {e}")
+            for _, _, _, staged_path in staged:
+                try:
+                    os.unlink(staged_path)
+                except OSError:
+                    pass
+            return 0
+
+        for (path, stat, digest, _), task_id in zip(staged, task_ids):
+            self._record(path, stat, digest, task_id)
+            self.index.set(f"sha256:{digest}", {"path": path, "task_id": task_id, "enqueued_at": time.time()})
+            self._pending.pop(path, None)
+            for duplicate_path, duplicate_stat in batch_duplicates[digest]:
+                self._record(duplicate_path, duplicate_stat, digest, task_id)
+                self._pending.pop(duplicate_path, None)
+                self.stats["duplicates"] += 1
+                logger.info(f"{duplicate_path} has the same content as {path}, not enqueued")
+
+        self.stats["enqueued"] += len(staged)
+        self.stats["batches"] += 1
+        logger.info(f"Enqueued {len(staged)} new or changed .msg files")
+        return len(staged)
+
+    def _stage(self, path: str, digest: str) -> str:
+        """Hard-link (or copy) the file to a path the task may delete"""
+        staged_path = os.path.join(self.staging_dir, f"{digest[:16]}_{os.path.basename(path)}")
+        if os.path.exists(staged_path):
+            os.unlink(staged_path)
+        try:
+            os.link(path, staged_path)
+        except OSError:
+            shutil.copy2(path, staged_path)
+        return staged_path
+
+    def _record(self, path: str, stat: os.stat_result, digest: str, task_id: str):
+        self.index.set(f"path:{path}", {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "task_id": task_id,
+            "enqueued_at": time.time(),
+        })
+
+    def run(self, stop_event: Optional[threading.Event] = None):
+        """
+        Watch until stop_event is set (or KeyboardInterrupt)
+
+        Uses inotify/FSEvents/ReadDirectoryChangesW through watchfiles when
+        available and falls back to rescanning every poll_interval seconds.
+        """
+        stop_event = stop_event or threading.Event()
+        self.scan()
+        self.process_ready()
+
+        if watchfiles is not None:
+            logger.info(f"Watching {self.watch_dir} for .msg files (polling={self.force_polling})")
+            # Wake up regularly so settling files are picked up without further events
+            timeout_ms = int(max(self.settle_seconds / 2, 0.2) * 1000)
+            for changes in watchfiles.watch(
+                self.watch_dir,
+                stop_event=stop_event,
+                debounce=timeout_ms,
+                rust_timeout=timeout_ms,
+                yield_on_timeout=True,
+                force_polling=self.force_polling,
+                poll_delay_ms=int(self.poll_interval * 1000),
+                raise_interrupt=False
+            ):
+                for change, path in changes:
+                    if change == watchfiles.Change.deleted:
+                        self._pending.pop(path, None)
+                    else:
+                        self.observe(path)
+                self.process_ready()
+        else:
+            logger.info(f"Polling {self.watch_dir} for .msg files every {self.poll_interval}s")
+            tick = min(self.poll_interval, max(self.settle_seconds / 2, 0.2))
+            next_scan = time.monotonic() + self.poll_interval
+            try:
+                while not stop_event.wait(tick):
+                    if time.monotonic() >= next_scan:
+                        self.scan()
+                        next_scan = time.monotonic() + self.poll_interval
+                    self.process_ready()
+            except KeyboardInterrupt:
+                pass
+
+        logger.info(f"Mailbox watcher stopped: {self.stats}")
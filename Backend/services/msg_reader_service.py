@@ -4,30 +4,155 @@ Based on the provided comprehensive MSGFileReader class
 """
 import os
 import sys
+import tempfile
 import extract_msg
+import olefile
 from pathlib import Path
 import json
 from datetime import datetime
 import base64
+import hashlib
+import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# MAPI stream names used to read attachment metadata without loading payloads
+ATTACHMENT_STORAGE_PREFIX = '__attach_version1.0_#'
+ATTACH_LONG_FILENAME = '__substg1.0_3707'
+ATTACH_SHORT_FILENAME = '__substg1.0_3704'
+ATTACH_MIME_TAG = '__substg1.0_370E'
+ATTACH_DATA_STREAM = '__substg1.0_37010102'
+
+# Streaming extraction: bytes read per chunk, and in-memory limit for spooled copies
+ATTACHMENT_CHUNK_SIZE = int(os.getenv('ATTACHMENT_CHUNK_SIZE_KB', '1024')) * 1024
+ATTACHMENT_SPOOL_MAX_MEMORY = int(os.getenv('ATTACHMENT_SPOOL_MAX_MB', '8')) * 1024 * 1024
+
+# Marks an attachment payload that has not been read from the .msg yet
+_NOT_LOADED = object()
+
+def _iter_ole_stream(ole, stream_path, chunk_size):
+    """
+    Yield the contents of an OLE stream in chunks of at most chunk_size bytes.
+    
+    olefile.openstream() reads the whole stream into memory, so regular
+    streams are read sector run by sector run following the FAT chain
+    instead. Streams stored in the mini stream (< 4 KB) are read whole.
+    """
+    entry = ole.direntries[ole._find(stream_path)]
+    remaining = entry.size
+    if remaining < ole.minisectorcutoff:
+        with ole.openstream(stream_path) as stream:
+            data = stream.read()
+        if data:
+            yield data
+        return
+    
+    sector_size = ole.sectorsize
+    chunk_size = max(chunk_size, sector_size)
+    sector = entry.isectStart
+    # Each sector is visited once; more steps than that means a FAT loop
+    for _ in range(len(ole.fat)):
+        if remaining <= 0:
+            return
+        if not 0 <= sector < len(ole.fat):
+            raise IOError(f"Incomplete OLE stream {stream_path}: {remaining} bytes missing")
+        
+        # Coalesce physically contiguous sectors into one read
+        run_start = sector
+        run_length = 1
+        while (run_length * sector_size < min(chunk_size, remaining)
+               and ole.fat[sector] == sector + 1):
+            sector += 1
+            run_length += 1
+        
+        length = min(run_length * sector_size, remaining)
+        ole.fp.seek(sector_size * (run_start + 1))
+        data = ole.fp.read(length)
+        if len(data) != length:
+            raise IOError(f"Truncated OLE stream {stream_path}")
+        yield data
+        remaining -= length
+        sector = ole.fat[sector]
+    
+    if remaining > 0:
+        raise IOError(f"Malformed OLE stream {stream_path}: sector chain loops")
+
+class _LazyEmailData(dict):
+    """
+    Email data dictionary whose expensive fields are loaded on first access.
+    
+    Pending fields resolve through item access, get() and `in`; call
+    materialize() before iterating or serializing the whole dictionary.
+    """
+    
+    def __init__(self, data, loaders):
+        super().__init__(data)
+        self._loaders = dict(loaders)
+    
+    def __missing__(self, key):
+        loader = self._loaders.pop(key, None)
+        if loader is None:
+            raise KeyError(key)
+        value = loader()
+        self[key] = value
+        return value
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._loaders
+    
+    def materialize(self):
+        for key in list(self._loaders):
+            self[key]
+        return self
+
 class MSGFileReader:
     """
     A comprehensive class to read Outlook .msg files and extract email content and attachments.
     """
     
-    def __init__(self, msg_file_path):
+    def __init__(self, msg_file_path, lazy=False):
         """
         Initialize the MSGFileReader with a .msg file path.
         
         Args:
             msg_file_path (str): Path to the .msg file
+            lazy (bool): Only read headers and attachment names/sizes up front.
+                Body, HTML body, transport headers and attachment payloads
+                are read from the file when first accessed. Suited to triage
+                and listing; call close() when done.
         """
         self.msg_file_path = Path(msg_file_path)
+        self.lazy = lazy
         self.msg = None
         self.email_data = {}
+        # Raw attachment payloads, aligned with email_data['attachments']
+        self._attachment_payloads = []
+        self._attachment_storages = []
+        self._ole = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Close the underlying .msg file."""
+        if self.msg is not None:
+            try:
+                self.msg.close()
+            except Exception:
+                pass
+        if self._ole is not None:
+            self._ole.close()
+            self._ole = None
         
     def read_msg_file(self):
         """
@@ -36,6 +161,9 @@ class MSGFileReader:
         Returns:
             dict: Dictionary containing all email information
         """
+        if self.lazy:
+            return self._read_msg_file_lazy()
+        
         try:
             # Open the .msg file
             self.msg = extract_msg.Message(self.msg_file_path)
@@ -64,85 +192,316 @@ class MSGFileReader:
             logger.error(f"Error reading .msg file: {e}")
             return None
     
+    def _read_msg_file_lazy(self):
+        """
+        Read headers and attachment metadata without loading attachment streams.
+        
+        Returns:
+            dict: Email data whose body, html_body and headers load on access
+        """
+        try:
+            # Attachments are not instantiated (and their streams not read) until requested
+            self.msg = extract_msg.Message(self.msg_file_path, delayAttachments=True)
+            
+            self.email_data = _LazyEmailData(
+                {
+                    'file_path': str(self.msg_file_path),
+                    'subject': self.msg.subject or '',
+                    'sender': self.msg.sender or '',
+                    'to': self.msg.to or '',
+                    'cc': self.msg.cc or '',
+                    'bcc': self.msg.bcc or '',
+                    'date': self.msg.date or '',
+                    'attachments': []
+                },
+                {
+                    'body': lambda: self.msg.body or '',
+                    'html_body': lambda: self.msg.htmlBody or '',
+                    'headers': lambda: dict(self.msg.header) if hasattr(self.msg, 'header') else {}
+                }
+            )
+            
+            self._list_attachments()
+            
+            return self.email_data
+            
+        except Exception as e:
+            logger.error(f"Error reading .msg file: {e}")
+            return None
+    
+    def _list_attachments(self):
+        """
+        Collect attachment names, sizes and MIME types from the OLE directory.
+        """
+        self._attachment_payloads = []
+        self._attachment_storages = []
+        try:
+            storages = sorted({
+                entry[0] for entry in self.msg.listDir(streams=False, storages=True)
+                if len(entry) == 1 and entry[0].startswith(ATTACHMENT_STORAGE_PREFIX)
+            })
+            
+            for storage in storages:
+                filename = (
+                    self.msg.getStringStream(f'{storage}/{ATTACH_LONG_FILENAME}')
+                    or self.msg.getStringStream(f'{storage}/{ATTACH_SHORT_FILENAME}')
+                    or 'unknown'
+                )
+                
+                # Embedded messages have no data stream and no payload, as in eager mode
+                size = 0
+                data_path = f'{storage}/{ATTACH_DATA_STREAM}'
+                if self.msg.exists(data_path):
+                    size = self.msg._getOleEntry(data_path).size
+                
+                self.email_data['attachments'].append({
+                    'filename': filename,
+                    'size': size,
+                    'content_type': self.msg.getStringStream(f'{storage}/{ATTACH_MIME_TAG}') or 'application/octet-stream'
+                })
+                self._attachment_storages.append(storage)
+                self._attachment_payloads.append(_NOT_LOADED if size else None)
+        except Exception as e:
+            logger.error(f"Error listing attachments: {e}")
+    
+    def _get_attachment_payload(self, index):
+        """
+        Return the raw bytes of an attachment, reading them on first access in lazy mode.
+        """
+        if index >= len(self._attachment_payloads):
+            return None
+        
+        payload = self._attachment_payloads[index]
+        if payload is _NOT_LOADED:
+            try:
+                payload = self.msg.getStream(f'{self._attachment_storages[index]}/{ATTACH_DATA_STREAM}')
+            except Exception as e:
+                logger.error(f"Error loading attachment {index}: {e}")
+                payload = None
+            self._attachment_payloads[index] = payload
+        
+        return payload
+    
     def _extract_attachments(self):
         """
         Extract all attachments from the email.
+        
+        Payloads are kept as raw bytes in self._attachment_payloads; the
+        attachment entries in email_data only carry metadata. Base64 is
+        produced on demand by to_json_dict().
         """
+        self._attachment_payloads = []
         try:
             if self.msg and hasattr(self.msg, 'attachments') and self.msg.attachments:
                 for attachment in self.msg.attachments:
                     # Get attachment data safely
                     attachment_data_raw = getattr(attachment, 'data', None)
-                    data_size = 0
-                    encoded_data = None
+                    payload = None
                     
                     if attachment_data_raw is not None:
                         try:
-                            # Ensure we have bytes for size calculation and encoding
+                            # Keep a reference to the bytes already loaded by extract_msg (no copy)
                             if isinstance(attachment_data_raw, bytes):
-                                data_size = len(attachment_data_raw)
-                                encoded_data = base64.b64encode(attachment_data_raw).decode('utf-8')
+                                payload = attachment_data_raw
                             else:
                                 # Try to convert to bytes if it's not already
-                                data_bytes = bytes(attachment_data_raw)
-                                data_size = len(data_bytes)
-                                encoded_data = base64.b64encode(data_bytes).decode('utf-8')
+                                payload = bytes(attachment_data_raw)
                         except (TypeError, AttributeError):
                             # If conversion fails, skip this attachment data
-                            data_size = 0
-                            encoded_data = None
+                            payload = None
                     
                     attachment_data = {
                         'filename': getattr(attachment, 'longFilename', None) or getattr(attachment, 'shortFilename', None) or 'unknown',
-                        'size': data_size,
-                        'content_type': getattr(attachment, 'mimetype', None) or 'application/octet-stream',
-                        'data': encoded_data
+                        'size': len(payload) if payload is not None else 0,
+                        'content_type': getattr(attachment, 'mimetype', None) or 'application/octet-stream'
                     }
                     self.email_data['attachments'].append(attachment_data)
+                    self._attachment_payloads.append(payload)
         except Exception as e:
             logger.error(f"Error extracting attachments: {e}")
     
-    def save_attachments(self, output_dir=None):
+    def get_attachment_data(self, index):
+        """
+        Get the raw payload of an attachment without copying it.
+        
+        Args:
+            index (int): Position of the attachment in email_data['attachments']
+            
+        Returns:
+            memoryview: Read-only view of the attachment bytes, or None if unavailable
+        """
+        payload = self._get_attachment_payload(index)
+        if payload is None:
+            return None
+        return memoryview(payload)
+    
+    def iter_attachment_chunks(self, index, chunk_size=None):
+        """
+        Yield the bytes of an attachment in bounded chunks.
+        
+        Payloads already in memory are sliced without copying. Payloads not
+        loaded yet (lazy mode) are copied straight from the .msg file, so at
+        most one chunk is held in memory at a time.
+        
+        Args:
+            index (int): Position of the attachment in email_data['attachments']
+            chunk_size (int): Bytes per chunk (defaults to ATTACHMENT_CHUNK_SIZE_KB)
+            
+        Yields:
+            bytes or memoryview: Consecutive pieces of the attachment
+        """
+        chunk_size = chunk_size or ATTACHMENT_CHUNK_SIZE
+        if index >= len(self._attachment_payloads):
+            return
+        
+        payload = self._attachment_payloads[index]
+        if payload is _NOT_LOADED:
+            if self._ole is None:
+                self._ole = olefile.OleFileIO(str(self.msg_file_path))
+            stream_path = f'{self._attachment_storages[index]}/{ATTACH_DATA_STREAM}'
+            yield from _iter_ole_stream(self._ole, stream_path, chunk_size)
+            return
+        
+        if payload:
+            view = memoryview(payload)
+            for offset in range(0, len(view), chunk_size):
+                yield view[offset:offset + chunk_size]
+    
+    def stream_attachment(self, index, destination, chunk_size=None):
+        """
+        Copy an attachment to a file path or writable binary file object.
+        
+        Args:
+            index (int): Position of the attachment in email_data['attachments']
+            destination (str, Path or file object): Where to write the bytes.
+                File objects are written to but not closed.
+            chunk_size (int): Bytes per chunk (defaults to ATTACHMENT_CHUNK_SIZE_KB)
+            
+        Returns:
+            int: Number of bytes written
+        """
+        if hasattr(destination, 'write'):
+            written = 0
+            for chunk in self.iter_attachment_chunks(index, chunk_size):
+                destination.write(chunk)
+                written += len(chunk)
+            return written
+        
+        with open(destination, 'wb') as f:
+            return self.stream_attachment(index, f, chunk_size)
+    
+    def spool_attachment(self, index, max_memory=None, chunk_size=None):
+        """
+        Copy an attachment into a spooled temporary file.
+        
+        The copy stays in memory up to max_memory bytes and rolls over to a
+        temporary file on disk beyond that.
+        
+        Args:
+            index (int): Position of the attachment in email_data['attachments']
+            max_memory (int): In-memory limit (defaults to ATTACHMENT_SPOOL_MAX_MB)
+            chunk_size (int): Bytes per chunk (defaults to ATTACHMENT_CHUNK_SIZE_KB)
+            
+        Returns:
+            tempfile.SpooledTemporaryFile: File positioned at the start; the
+            caller closes it
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=max_memory or ATTACHMENT_SPOOL_MAX_MEMORY)
+        try:
+            self.stream_attachment(index, spool, chunk_size)
+            spool.seek(0)
+            return spool
+        except Exception:
+            spool.close()
+            raise
+    
+    def to_json_dict(self, include_attachment_data=True):
+        """
+        Get a JSON-serializable copy of the email data.
+        
+        Args:
+            include_attachment_data (bool): Add base64-encoded attachment
+                payloads under 'data' (encoded only when requested)
+            
+        Returns:
+            dict: Email data safe to pass to json.dumps
+        """
+        if not self.email_data:
+            return None
+        
+        if isinstance(self.email_data, _LazyEmailData):
+            self.email_data.materialize()
+        
+        json_data = {}
+        for key, value in self.email_data.items():
+            if isinstance(value, bytes):
+                # extract_msg returns the HTML body as bytes
+                value = value.decode('utf-8', errors='replace')
+            json_data[key] = value
+        json_data['date'] = str(self.email_data.get('date', ''))
+        json_data['headers'] = {key: str(value) for key, value in self.email_data.get('headers', {}).items()}
+        json_data['attachments'] = []
+        for i, attachment in enumerate(self.email_data['attachments']):
+            attachment_json = dict(attachment)
+            if include_attachment_data:
+                payload = self._get_attachment_payload(i)
+                attachment_json['data'] = base64.b64encode(payload).decode('utf-8') if payload is not None else None
+            json_data['attachments'].append(attachment_json)
+        
+        return json_data
+    
+    def save_attachments(self, output_dir=None, sink=None, chunk_size=None):
         """
         Save all attachments to a specified directory.
         
+        Attachments are copied in bounded chunks (see iter_attachment_chunks),
+        so with a lazy reader memory use stays at about one chunk regardless
+        of attachment size.
+        
         Args:
             output_dir (str): Directory to save attachments. If None, saves to current directory.
+            sink (callable): Optional consumer called as sink(attachment, chunks)
+                for each attachment, where chunks iterates over its bytes.
+                Replaces writing to output_dir.
+            chunk_size (int): Bytes per chunk (defaults to ATTACHMENT_CHUNK_SIZE_KB)
             
         Returns:
-            list: List of saved file paths
+            list: List of saved file paths, or the sink's return values
         """
         if not self.email_data or not self.email_data['attachments']:
             logger.info("No attachments found or email not read yet.")
             return []
         
-        if output_dir is None:
-            output_dir = Path.cwd() / "extracted_attachments"
-        else:
-            output_dir = Path(output_dir)
-        
-        output_dir.mkdir(exist_ok=True)
+        if sink is None:
+            if output_dir is None:
+                output_dir = Path.cwd() / "extracted_attachments"
+            else:
+                output_dir = Path(output_dir)
+            
+            output_dir.mkdir(exist_ok=True)
         saved_files = []
         
         try:
             for i, attachment in enumerate(self.email_data['attachments']):
-                if attachment['data']:
-                    # Decode the base64 data
-                    file_data = base64.b64decode(attachment['data'])
-                    
-                    # Create safe filename
-                    safe_filename = self._sanitize_filename(attachment['filename'])
-                    if not safe_filename:
-                        safe_filename = f"attachment_{i+1}"
-                    
-                    file_path = output_dir / safe_filename
-                    
-                    # Write the file
-                    with open(file_path, 'wb') as f:
-                        f.write(file_data)
-                    
-                    saved_files.append(str(file_path))
-                    logger.info(f"Saved attachment: {file_path}")
+                if i >= len(self._attachment_payloads) or self._attachment_payloads[i] is None:
+                    continue
+                
+                if sink is not None:
+                    saved_files.append(sink(attachment, self.iter_attachment_chunks(i, chunk_size)))
+                    continue
+                
+                # Create safe filename
+                safe_filename = self._sanitize_filename(attachment['filename'])
+                if not safe_filename:
+                    safe_filename = f"attachment_{i+1}"
+                
+                file_path = output_dir / safe_filename
+                
+                # Write the file chunk by chunk
+                self.stream_attachment(i, file_path, chunk_size)
+                
+                saved_files.append(str(file_path))
+                logger.info(f"Saved attachment: {file_path}")
             
             return saved_files
             
@@ -213,11 +572,10 @@ class MSGFileReader:
         if not self.email_data or not self.email_data['attachments']:
             return attachments
         
-        for attachment in self.email_data['attachments']:
-            if attachment['data']:
-                # Decode base64 data for Cloudinary upload
-                file_data = base64.b64decode(attachment['data'])
-                
+        for i, attachment in enumerate(self.email_data['attachments']):
+            file_data = self._get_attachment_payload(i)
+            if file_data:
+                # Raw bytes are shared with the reader, not copied
                 attachments.append({
                     'filename': attachment['filename'],
                     'data': file_data,
@@ -227,6 +585,42 @@ class MSGFileReader:
         
         return attachments
 
+    def compute_content_fingerprint(self):
+        """
+        Compute a digest of the normalized email body and attachment contents.
+        
+        Resent or re-forwarded copies of the same submission produce the same
+        fingerprint even when the .msg container bytes differ. Attachments are
+        hashed chunk by chunk, so a lazy reader never loads them whole.
+        
+        Returns:
+            str: Hex SHA-256 fingerprint, or None if the email has not been read
+        """
+        if not self.email_data:
+            return None
+        
+        body = self.email_data.get('body') or ''
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', errors='ignore')
+        normalized_body = re.sub(r'\s+', ' ', body).strip().lower()
+        
+        attachment_digests = []
+        for i in range(len(self._attachment_payloads)):
+            digest = hashlib.sha256()
+            size = 0
+            for chunk in self.iter_attachment_chunks(i):
+                digest.update(chunk)
+                size += len(chunk)
+            if size:
+                attachment_digests.append(digest.hexdigest())
+        
+        fingerprint = hashlib.sha256()
+        fingerprint.update(normalized_body.encode('utf-8'))
+        for digest in sorted(attachment_digests):
+            fingerprint.update(b'\n' + digest.encode('ascii'))
+        
+        return fingerprint.hexdigest()
+
 # Utility functions for batch processing
 def sanitize_directory_name(name):
     """
@@ -292,13 +686,33 @@ def get_attachments_info(msg_file_path):
         list: List of attachment information dictionaries
     """
     try:
-        reader = MSGFileReader(msg_file_path)
-        email_data = reader.read_msg_file()
-        
-        if email_data and email_data['attachments']:
-            return email_data['attachments']
-        else:
-            return []
+        # Names and sizes come from the OLE directory, payloads are never read
+        with MSGFileReader(msg_file_path, lazy=True) as reader:
+            email_data = reader.read_msg_file()
+            
+            if email_data and email_data['attachments']:
+                return email_data['attachments']
+            else:
+                return []
     except Exception as e:
         logger.error(f"Error reading attachments: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def get_email_summary(msg_file_path):
+    """
+    Get a triage summary of a .msg file without loading attachment payloads.
+    
+    Args:
+        msg_file_path (str): Path to the .msg file
+        
+    Returns:
+        dict: Email summary (see MSGFileReader.get_email_summary), or None
+    """
+    try:
+        with MSGFileReader(msg_file_path, lazy=True) as reader:
+            if not reader.read_msg_file():
+                return None
+            return reader.get_email_summary()
+    except Exception as e:
+        logger.error(f"Error reading email summary: {e}")
+        return None
\ No newline at end of file
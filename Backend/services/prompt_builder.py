@@ -0,0 +1,300 @@
+"""
+Token-budgeted prompt builder for reinsurance submission analysis
+Chunks parsed documents and fills the budget with the chunks most relevant
+to the working sheet fields
+"""
+import os
+import re
+import math
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Token budget for the submission text (system prompt and format instructions come on top)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "24000"))
+EMAIL_BODY_TOKEN_BUDGET = int(os.getenv("EMAIL_BODY_TOKEN_BUDGET", "4000"))
+TABLES_TOKEN_BUDGET = int(os.getenv("TABLES_TOKEN_BUDGET", "2000"))
+DOCUMENT_CHUNK_TOKENS = int(os.getenv("DOCUMENT_CHUNK_TOKENS", "400"))
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+
+# Rough characters per token when tiktoken is unavailable (conservative for English)
+CHARS_PER_TOKEN = 3.5
+
+# Working sheet fields and the terms that signal them, with relevance weights
+RELEVANCE_TERMS: List[Tuple[str, float]] = [
+    (r"total sum insured|sum insured|\btsi\b|sums? insured|insured values?|contract (?:price|value)", 5.0),
+    (r"possible maximum loss|probable maximum loss|maximum foreseeable loss|\bpml\b|\beml\b|\bmfl\b", 5.0),
+    (r"claims? (?:experience|history|record)|loss(?:es)? (?:history|experience|record)|loss ratio|burning cost|\bclaims?\b", 4.0),
+    (r"perils?|all risks?|\bfire\b|lightning|explosion|flood|earthquake|storm|windstorm|\bsrcc\b|riot|terrorism|machinery breakdown|business interruption|\bcar\b|\bear\b", 3.5),
+    (r"premium|\brates?\b|per mille|‰|brokerage|commission", 3.5),
+    (r"deductibles?|\bexcess\b|retention|\bshare\b|\bline\b|capacity|\border\b", 3.0),
+    (r"period of insurance|inception|expiry|maintenance period|construction period", 2.5),
+    (r"situation|location|address|occupation|occupancy|construction class|protection|sprinkler|hydrant|survey", 2.0),
+    (r"\binsured\b|cedant|reinsured|broker|principal|contractor", 1.5),
+]
+
+# Figures: currency amounts, large numbers and percentages
+FIGURE_TERMS = r"\b(?:usd|kes|ksh|eur|gbp|inr|egp|php|us\$)\s?[\d,.]+|\$\s?[\d,.]+|\b\d{1,3}(?:,\d{3})+(?:\.\d+)?\b|\b\d+(?:\.\d+)?\s?%"
+FIGURE_WEIGHT = 1.5
+
+# All terms in one alternation so each chunk is scanned once (applied to lowercased text)
+_RELEVANCE_PATTERN = re.compile("|".join(
+    f"(?P<t{i}>{pattern})" for i, (pattern, _) in enumerate(RELEVANCE_TERMS + [(FIGURE_TERMS, FIGURE_WEIGHT)])
+))
+_RELEVANCE_WEIGHTS = {f"t{i}": weight for i, (_, weight) in enumerate(RELEVANCE_TERMS + [(FIGURE_TERMS, FIGURE_WEIGHT)])}
+
+_encoder = None
+_encoder_lock = threading.Lock()
+_encoder_loaded = False
+
+
+def _get_encoder():
+    """Load the tiktoken encoding once; None when unavailable (e.g. offline)"""
+    global _encoder, _encoder_loaded
+    if _encoder_loaded:
+        return _encoder
+    with _encoder_lock:
+        if not _encoder_loaded:
+            try:
+                import tiktoken
+                _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding {TOKENIZER_ENCODING} unavailable, estimating tokens from length: {e}")
+                _encoder = None
+            _encoder_loaded = True
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (estimated from its length without tiktoken)"""
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, marking the cut"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    marker = "\n[... truncated ...]"
+    budget = max(max_tokens - count_tokens(marker), 0)
+    encoder = _get_encoder()
+    if encoder is not None:
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:budget]) + marker
+    return text[:int(budget * CHARS_PER_TOKEN)] + marker
+
+
+def chunk_text(text: str, max_tokens: int = DOCUMENT_CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into chunks of about max_tokens on paragraph boundaries
+
+    Paragraphs (and markdown table blocks, which have no blank lines) stay
+    whole unless a single paragraph is larger than max_tokens.
+    """
+    chunks = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = count_tokens(paragraph)
+
+        if tokens > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            # Oversized paragraph: split by lines
+            lines: List[str] = []
+            lines_tokens = 0
+            for line in paragraph.split("\n"):
+                line_tokens = count_tokens(line)
+                if lines and lines_tokens + line_tokens > max_tokens:
+                    chunks.append("\n".join(lines))
+                    lines, lines_tokens = [], 0
+                lines.append(truncate_to_tokens(line, max_tokens))
+                lines_tokens += min(line_tokens, max_tokens)
+            if lines:
+                chunks.append("\n".join(lines))
+            continue
+
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def score_relevance(text: str) -> float:
+    """
+    Score how much a chunk helps fill the working sheet
+
+    Weighted counts of field terms (TSI, PML, perils, claims, premium, ...)
+    plus figures, damped by length so long boilerplate does not win on
+    volume alone.
+    """
+    counts: Dict[str, int] = {}
+    for match in _RELEVANCE_PATTERN.finditer(text.lower()):
+        counts[match.lastgroup] = counts.get(match.lastgroup, 0) + 1
+    # Diminishing returns for repeated mentions of the same field
+    score = sum(_RELEVANCE_WEIGHTS[group] * (1 + math.log(matches)) for group, matches in counts.items())
+    return score / math.sqrt(max(count_tokens(text), 1) / 100)
+
+
+class PromptBuilder:
+    """
+    Builds the analysis input within a hard token budget
+
+    Fixed sections (email details, attachment list) are always included,
+    the email body and tables get capped budgets, and the remainder is
+    filled with the highest-scoring document chunks, presented in document
+    order.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = PROMPT_TOKEN_BUDGET,
+        email_body_tokens: int = EMAIL_BODY_TOKEN_BUDGET,
+        tables_tokens: int = TABLES_TOKEN_BUDGET,
+        chunk_tokens: int = DOCUMENT_CHUNK_TOKENS
+    ):
+        self.max_tokens = max_tokens
+        self.email_body_tokens = email_body_tokens
+        self.tables_tokens = tables_tokens
+        self.chunk_tokens = chunk_tokens
+
+    def build(self, email_data: Dict[str, Any], document_data: Optional[Dict[str, Any]] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the analysis input text
+
+        Args:
+            email_data: Email fields (sender, subject, date, body, attachments)
+            document_data: Output of DocumentProcessingService.extract_key_information
+
+        Returns:
+            (input text, usage report with tokens per section)
+        """
+        document_data = document_data or {}
+        usage: Dict[str, Any] = {"budget": self.max_tokens}
+
+        header = f"""
+FACULTATIVE REINSURANCE SUBMISSION ANALYSIS
+
+EMAIL DETAILS:
+- From: {email_data.get('sender', 'Unknown')}
+- Subject: {email_data.get('subject', 'No Subject')}
+- Date: {email_data.get('date', 'Unknown')}
+
+EMAIL CONTENT:
+"""
+        attachments_text = "\nATTACHMENTS:\n"
+        if email_data.get('attachments'):
+            for i, attachment in enumerate(email_data['attachments']):
+                attachments_text += f"- {attachment.get('filename', f'attachment_{i}')} "
+                attachments_text += f"({attachment.get('size', 0)} bytes)"
+                if attachment.get('cloudinary_url'):
+                    attachments_text += f" [URL: {attachment['cloudinary_url']}]"
+                attachments_text += "\n"
+        else:
+            attachments_text += "No attachments found.\n"
+
+        usage["header"] = count_tokens(header)
+        usage["attachments"] = count_tokens(attachments_text)
+        remaining = self.max_tokens - usage["header"] - usage["attachments"]
+
+        body = str(email_data.get('body') or 'No content available')
+        body = truncate_to_tokens(body, min(self.email_body_tokens, max(remaining, 0)))
+        usage["email_body"] = count_tokens(body)
+        remaining -= usage["email_body"]
+
+        input_text = header + body + "\n" + attachments_text
+
+        documents = document_data.get('documents')
+        if documents is None and document_data.get('combined_text'):
+            documents = [{"name": "documents", "text": document_data['combined_text']}]
+
+        if documents:
+            summary_text = f"""
+DOCUMENT PROCESSING SUMMARY:
+- Total documents processed: {document_data.get('document_count', 0)}
+- Success rate: {document_data.get('processing_summary', {}).get('success_rate', 0):.2%}
+- Total text extracted: {document_data.get('total_text_length', 0)} characters
+"""
+            usage["document_summary"] = count_tokens(summary_text)
+            remaining -= usage["document_summary"]
+
+            tables_text = self._tables_section(document_data.get('tables') or [], min(self.tables_tokens, max(remaining, 0)))
+            usage["tables"] = count_tokens(tables_text)
+            remaining -= usage["tables"]
+
+            documents_text, usage["documents"] = self._documents_section(documents, max(remaining, 0))
+            input_text += documents_text + summary_text + tables_text
+
+        usage["total"] = count_tokens(input_text)
+        return input_text, usage
+
+    def _documents_section(self, documents: List[Dict[str, Any]], budget: int) -> Tuple[str, Dict[str, Any]]:
+        """Select the most relevant chunks that fit the budget"""
+        heading = "\nPROCESSED DOCUMENT CONTENT (most relevant excerpts):\n"
+        budget -= count_tokens(heading)
+
+        candidates = []
+        for doc_index, document in enumerate(documents):
+            for chunk_index, chunk in enumerate(chunk_text(document.get('text') or '', self.chunk_tokens)):
+                candidates.append({
+                    "doc": doc_index,
+                    "position": chunk_index,
+                    "text": chunk,
+                    "tokens": count_tokens(chunk) + 12,  # plus the excerpt label
+                    "score": score_relevance(chunk),
+                })
+
+        selected = []
+        used = 0
+        for candidate in sorted(candidates, key=lambda c: (-c["score"], c["doc"], c["position"])):
+            if used + candidate["tokens"] <= budget:
+                selected.append(candidate)
+                used += candidate["tokens"]
+
+        # Present excerpts in reading order so tables and context stay coherent
+        selected.sort(key=lambda c: (c["doc"], c["position"]))
+        parts = [heading]
+        for candidate in selected:
+            name = documents[candidate["doc"]].get('name') or f"document {candidate['doc'] + 1}"
+            parts.append(f"\n[{name} - excerpt {candidate['position'] + 1}]\n{candidate['text']}\n")
+
+        report = {
+            "tokens": used,
+            "chunks_total": len(candidates),
+            "chunks_selected": len(selected),
+            "tokens_available": sum(c["tokens"] for c in candidates),
+        }
+        return "".join(parts), report
+
+    def _tables_section(self, tables: List[Any], budget: int) -> str:
+        """Highest-scoring tables, each capped, within the budget"""
+        if not tables or budget <= 0:
+            return ""
+        text = "\nEXTRACTED TABLES:\n"
+        used = count_tokens(text)
+        ranked = sorted(enumerate(tables), key=lambda item: -score_relevance(str(item[1])))
+        for i, table in ranked:
+            entry = f"Table {i + 1}: {truncate_to_tokens(str(table), 150)}\n"
+            tokens = count_tokens(entry)
+            if used + tokens > budget:
+                break
+            text += entry
+            used += tokens
+        return text
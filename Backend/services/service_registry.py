@@ -0,0 +1,85 @@
+"""
+Process-wide registry of shared service instances
+
+Services hold HTTP clients (ChatOpenAI, LlamaParse, Cloudinary's pool) and
+are safe to share between threads, so each process builds them once on
+first use instead of once per request.
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_instances: Dict[str, Any] = {}
+_lock = threading.RLock()
+_build_seconds: Dict[str, float] = {}
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    """Return the named instance, building it under the registry lock on first use"""
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+    with _lock:
+        instance = _instances.get(name)
+        if instance is None:
+            started_at = time.perf_counter()
+            instance = factory()
+            _build_seconds[name] = round(time.perf_counter() - started_at, 3)
+            _instances[name] = instance
+            logger.info(f"Initialized shared {name} in {_build_seconds[name]}s")
+        return instance
+
+
+def get_cloudinary_service():
+    from services.cloudinary_service import CloudinaryService
+    return _get("cloudinary_service", CloudinaryService)
+
+
+def get_document_processing_service():
+    from services.document_processing_service import DocumentProcessingService
+    return _get("document_processing_service", DocumentProcessingService)
+
+
+def get_ai_analysis_service():
+    from services.ai_analysis_service import AIAnalysisService
+    # Shares the registry's document processor (and its LlamaParse client)
+    return _get(
+        "ai_analysis_service",
+        lambda: AIAnalysisService(doc_processor=get_document_processing_service())
+    )
+
+
+def warm_up() -> Dict[str, str]:
+    """
+    Build all services ahead of the first request
+
+    Failures (e.g. a missing API key) are logged and left to surface on
+    first use, so the application still starts.
+
+    Returns:
+        Mapping of service name to "ready" or the error message
+    """
+    status = {}
+    for name, getter in (
+        ("cloudinary_service", get_cloudinary_service),
+        ("document_processing_service", get_document_processing_service),
+        ("ai_analysis_service", get_ai_analysis_service),
+    ):
+        try:
+            getter()
+            status[name] = "ready"
+        except Exception as e:
+            logger.warning(f"Could not warm up {name}: {e}")
+            status[name] = str(e)
+    return status
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "services": sorted(_instances),
+            "build_seconds": dict(_build_seconds),
+        }
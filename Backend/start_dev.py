@@ -6,6 +6,7 @@ This script helps you start all required services for development.
 
 import os
 import sys
+import tempfile
 import subprocess
 import time
 import signal
@@ -57,18 +58,38 @@ def start_redis():
         print(f"❌ Failed to start Redis: {e}")
         return False
 
-def start_celery_worker():
-    """Start Celery worker."""
-    print("🔄 Starting Celery worker...")
+def start_celery_worker(queues, pool, concurrency, name):
+    """Start a Celery worker consuming the given queues."""
+    print(f"🔄 Starting Celery worker ({queues})...")
     try:
         return subprocess.Popen([
             "poetry", "run", "celery", "-A", "celery_app", "worker", 
-            "--loglevel=info", "--concurrency=2"
+            "--loglevel=info", "-Q", queues, "-P", pool,
+            f"--concurrency={concurrency}", "-n", f"{name}@%h"
         ])
     except Exception as e:
         print(f"❌ Failed to start Celery worker: {e}")
         return None
 
+def start_celery_workers():
+    """Start the MSG parsing (processes) and remote call (threads) workers."""
+    # Both workers run on this host, so they can share a local staging directory
+    os.environ.setdefault(
+        "ATTACHMENT_STAGING_DIR", os.path.join(tempfile.gettempdir(), "reinsurance_attachments")
+    )
+    # prefork is not available on Windows
+    cpu_pool = "solo" if os.name == "nt" else "prefork"
+    return [
+        start_celery_worker(
+            os.getenv("CELERY_CPU_QUEUE", "msg_parsing"), cpu_pool,
+            os.getenv("CELERY_CPU_CONCURRENCY", "2"), "cpu"
+        ),
+        start_celery_worker(
+            os.getenv("CELERY_IO_QUEUE", "remote_calls") + ",celery", "threads",
+            os.getenv("CELERY_IO_CONCURRENCY", "16"), "io"
+        ),
+    ]
+
 def start_fastapi_server():
     """Start FastAPI server."""
     print("🚀 Starting FastAPI server...")
@@ -110,11 +131,11 @@ def main():
     processes = []
     
     try:
-        # Start Celery worker
-        celery_process = start_celery_worker()
-        if celery_process:
-            processes.append(celery_process)
-            print("✅ Celery worker started!")
+        # Start Celery workers
+        celery_processes = [p for p in start_celery_workers() if p]
+        if celery_processes:
+            processes.extend(celery_processes)
+            print(f"✅ {len(celery_processes)} Celery workers started!")
         
         # Start FastAPI server
         fastapi_process = start_fastapi_server()
@@ -125,7 +146,7 @@ def main():
         print("\n🎉 All services are running!")
         print("📊 FastAPI Server: http://localhost:8000")
         print("📊 API Documentation: http://localhost:8000/docs")
-        print("📊 Celery Worker: Running in background")
+        print("📊 Celery Workers: Running in background")
         print("\nPress Ctrl+C to stop all services...")
         
         # Wait for processes
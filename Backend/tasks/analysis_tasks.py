@@ -1,46 +1,81 @@
 """
 Celery tasks for reinsurance analysis
+
+A submission runs as a chain of two tasks on separate queues (see
+celery_app.analysis_pipeline): parse_msg does the CPU-bound MSG parsing
+on a prefork worker and stages the attachments on disk, then
+analyze_submission does the uploads, LlamaParse and LLM calls, which
+mostly wait on remote services, on a thread-pool worker. The last task's
+ID is the submission's task ID; parse_msg reports its progress under it.
 """
 import os
-import tempfile
+import shutil
 import logging
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from celery import Celery
+from celery.signals import task_failure, task_success, worker_init
 
-from services.cloudinary_service import CloudinaryService
-from services.ai_analysis_service import AIAnalysisService
 from services.msg_reader_service import MSGFileReader
 from models.reinsurance_models import EmailData
+from utils import task_events
 
 logger = logging.getLogger(__name__)
 
 # Initialize Celery app (import from main celery_app)
-from celery_app import celery_app
+from celery_app import celery_app, CPU_QUEUE, IO_QUEUE
 
-# Initialize services
-cloudinary_service = CloudinaryService()
-ai_analysis_service = AIAnalysisService()
+# How long a finished analysis waits for the background Cloudinary archival
+ARCHIVE_UPLOAD_WAIT_SECONDS = float(os.getenv("ARCHIVE_UPLOAD_WAIT_SECONDS", "60"))
 
-@celery_app.task(bind=True)
-def process_reinsurance_msg(self, file_path: str) -> Dict[str, Any]:
+# Attachments handed from parse_msg to analyze_submission: both workers must see this
+# directory (same host or a shared mount). There is no default, so a worker host cannot
+# silently stage into its own temp dir; workers of either pipeline queue refuse to start
+ATTACHMENT_STAGING_DIR = os.getenv("ATTACHMENT_STAGING_DIR")
+
+# Email body kept in stored results (the analysis itself uses the full body); 0 keeps it whole
+RESULT_BODY_MAX_CHARS = int(os.getenv("RESULT_BODY_MAX_CHARS", "1000"))
+
+def report_progress(task, progress: float, status: str, task_id: Optional[str] = None):
+    """Record a PROGRESS state and push it to /task-events listeners"""
+    task_id = task_id or task.request.id
+    task.update_state(task_id=task_id, state='PROGRESS', meta={'progress': progress, 'status': status})
+    task_events.publish_stage(task_id, progress, status)
+
+def report_failure(task, error: Exception, task_id: Optional[str] = None):
+    task.update_state(
+        task_id=task_id or task.request.id,
+        state='FAILURE',
+        meta={
+            'progress': 0,
+            'status': 'failed',
+            'error': str(error)
+        }
+    )
+
+def _parse_msg(task, file_path: str, task_id: str) -> Dict[str, Any]:
     """
-    Background task to process .msg file and perform AI analysis
+    Read the email and write its attachments to a staging directory
+
+    Returns:
+        JSON-serializable dict with 'email_data', 'attachments' (filename,
+        content_type, size and staged path) and 'staging_dir'
     """
+    staging_dir = os.path.join(ATTACHMENT_STAGING_DIR, task_id)
+    staged = []
+
     try:
-        # Update task progress
-        self.update_state(state='PROGRESS', meta={'progress': 10, 'status': 'Processing MSG file'})
-        
-        # Extract email data using MSGFileReader
+        report_progress(task, 10, 'Processing MSG file', task_id)
         logger.info(f"Processing MSG file: {file_path}")
-        
+
         try:
-            # Use the comprehensive MSGFileReader class
-            msg_reader = MSGFileReader(file_path)
-            msg_data = msg_reader.read_msg_file()
-            
-            if msg_data:
+            # Lazy reader: attachments are streamed to disk without loading them all
+            with MSGFileReader(file_path, lazy=True) as msg_reader:
+                msg_data = msg_reader.read_msg_file()
+                if not msg_data:
+                    raise Exception("MSGFileReader returned no data")
+
                 email_data = EmailData(
                     sender=msg_data.get('sender', 'Unknown'),
                     subject=msg_data.get('subject', 'No Subject'),
@@ -48,42 +83,39 @@ def process_reinsurance_msg(self, file_path: str) -> Dict[str, Any]:
                     date=msg_data.get('date', datetime.utcnow()),
                     attachments=[]
                 )
-                
-                # Process attachments using the MSGFileReader approach
-                self.update_state(state='PROGRESS', meta={'progress': 30, 'status': 'Processing attachments'})
+
+                report_progress(task, 30, 'Processing attachments', task_id)
                 if msg_data.get('attachments'):
-                    # Get attachments in format suitable for Cloudinary
-                    attachment_files = msg_reader.get_attachments_for_cloudinary()
-                    
+                    os.makedirs(staging_dir, exist_ok=True)
+
+                    def stage(attachment, chunks):
+                        # Index-based names: attachment filenames may repeat or be unsafe
+                        path = os.path.join(
+                            staging_dir,
+                            f"{len(staged):03d}{os.path.splitext(attachment['filename'] or '')[1]}"
+                        )
+                        with open(path, 'wb') as f:
+                            for chunk in chunks:
+                                f.write(chunk)
+                        staged.append({
+                            "filename": attachment['filename'],
+                            "content_type": attachment['content_type'],
+                            "size": attachment['size'],
+                            "path": path
+                        })
+
+                    msg_reader.save_attachments(sink=stage)
+
                     # Create attachment metadata
                     for attachment in msg_data['attachments']:
-                        attachment_data = {
+                        email_data.attachments.append({
                             "filename": attachment['filename'],
                             "content_type": attachment['content_type'],
                             "size": attachment['size']
-                        }
-                        email_data.attachments.append(attachment_data)
-                    
-                    # Upload attachments to Cloudinary
-                    if attachment_files:
-                        self.update_state(state='PROGRESS', meta={'progress': 50, 'status': 'Uploading attachments'})
-                        try:
-                            upload_results = cloudinary_service.upload_multiple_attachments(attachment_files)
-                            
-                            # Update attachment data with Cloudinary URLs
-                            for i, result in enumerate(upload_results):
-                                if result['status'] == 'success' and i < len(email_data.attachments):
-                                    email_data.attachments[i]['cloudinary_url'] = result['upload_result']['secure_url']
-                                    email_data.attachments[i]['public_id'] = result['upload_result']['public_id']
-                            
-                            logger.info(f"Uploaded {len(upload_results)} attachments to Cloudinary")
-                        except Exception as upload_error:
-                            logger.warning(f"Failed to upload some attachments: {upload_error}")
-                            
-                logger.info(f"Successfully processed email: {email_data.subject}")
-            else:
-                raise Exception("MSGFileReader returned no data")
-            
+                        })
+
+            logger.info(f"Successfully processed email: {email_data.subject} ({len(staged)} attachments staged)")
+
         except Exception as msg_error:
             logger.warning(f"Failed to parse MSG file: {msg_error}")
             # Create fallback email data
@@ -94,59 +126,203 @@ def process_reinsurance_msg(self, file_path: str) -> Dict[str, Any]:
                 date=datetime.utcnow(),
                 attachments=[]
             )
-        
+            staged = []
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        return {
+            "email_data": email_data.model_dump(mode='json'),
+            "attachments": staged,
+            "staging_dir": staging_dir if staged else None
+        }
+
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+def _remove_source(file_path: str):
+    """Delete the uploaded .msg file once no task run will read it again"""
+    try:
+        if file_path and os.path.exists(file_path):
+            os.unlink(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove {file_path}: {e}")
+
+def _analyze_submission(task, parsed: Dict[str, Any], use_cache: bool, task_id: str) -> Dict[str, Any]:
+    """
+    Archive the staged attachments, parse them and run the AI analysis
+    """
+    from services.service_registry import get_cloudinary_service, get_ai_analysis_service
+
+    upload_future = None
+    token_events = task_events.TokenPublisher(task_id)
+
+    try:
+        email_data = EmailData(**parsed['email_data'])
+
+        staging_dir = parsed.get('staging_dir')
+        if staging_dir and not os.path.isdir(staging_dir):
+            raise FileNotFoundError(
+                f"Staged attachments not found at {staging_dir}: ATTACHMENT_STAGING_DIR must be "
+                f"shared by the {CPU_QUEUE} and {IO_QUEUE} workers (same host or a common mount)"
+            )
+
+        attachment_files = []
+        for attachment in parsed['attachments']:
+            with open(attachment['path'], 'rb') as f:
+                attachment_files.append({
+                    'filename': attachment['filename'],
+                    'data': f.read(),
+                    'content_type': attachment['content_type'],
+                    'size': attachment['size']
+                })
+
+        # Archive attachments to Cloudinary while the analysis runs
+        if attachment_files:
+            upload_future = get_cloudinary_service().upload_multiple_attachments_in_background(attachment_files)
+
         # AI Analysis using GPT-5-mini with document processing
-        self.update_state(state='PROGRESS', meta={'progress': 70, 'status': 'Performing AI analysis with document processing'})
+        report_progress(task, 50, 'Performing AI analysis with document processing', task_id)
+        ai_analysis_service = get_ai_analysis_service()
         try:
-            # Get attachment URLs for AI analysis
-            attachment_urls = []
-            for attachment in email_data.attachments:
-                if attachment.get('cloudinary_url'):
-                    attachment_urls.append(attachment['cloudinary_url'])
-            
-            # Perform comprehensive AI analysis with document processing
+            # Parse attachments straight from memory instead of round-tripping through Cloudinary
             ai_result = ai_analysis_service.analyze_reinsurance_submission(
-                email_data.model_dump(), 
-                attachment_urls if attachment_urls else None
+                email_data.model_dump(),
+                attachments=attachment_files or None,
+                use_cache=use_cache,
+                document_callback=task_events.document_publisher(task_id),
+                token_callback=token_events
             )
-            
+            token_events.flush()
+
             logger.info("AI analysis with document processing completed successfully")
-            
+
         except Exception as ai_error:
             logger.warning(f"AI analysis failed, using fallback: {ai_error}")
             # Create fallback analysis
             ai_result = ai_analysis_service._create_fallback_analysis(email_data.model_dump())
-        
-        # Complete task
-        self.update_state(state='SUCCESS', meta={'progress': 100, 'status': 'Analysis completed'})
-        
-        result = {
-            "email_data": email_data.model_dump(),
+
+        # Attach Cloudinary URLs once the archival upload has finished
+        if upload_future is not None:
+            report_progress(task, 90, 'Archiving attachments', task_id)
+            try:
+                upload_results = upload_future.result(timeout=ARCHIVE_UPLOAD_WAIT_SECONDS)
+
+                # Update attachment data with Cloudinary URLs
+                for i, result in enumerate(upload_results):
+                    if result['status'] == 'success' and i < len(email_data.attachments):
+                        email_data.attachments[i]['cloudinary_url'] = result['upload_result']['secure_url']
+                        email_data.attachments[i]['public_id'] = result['upload_result']['public_id']
+
+                logger.info(f"Uploaded {len(upload_results)} attachments to Cloudinary")
+            except FutureTimeoutError:
+                logger.warning("Cloudinary archival still running, returning result without attachment URLs")
+            except Exception as upload_error:
+                logger.warning(f"Failed to upload some attachments: {upload_error}")
+
+        stored_email_data = email_data.model_dump()
+        body = stored_email_data.get('body') or ''
+        if RESULT_BODY_MAX_CHARS and len(body) > RESULT_BODY_MAX_CHARS:
+            # Same truncation as the sync path; the full length is kept for reference
+            stored_email_data['body'] = body[:RESULT_BODY_MAX_CHARS] + '...'
+            stored_email_data['body_length'] = len(body)
+
+        return {
+            "email_data": stored_email_data,
             "ai_analysis": ai_result.model_dump(),
             "processing_timestamp": datetime.utcnow().isoformat(),
             "status": "completed"
         }
-        
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.unlink(file_path)
-        
+
+    finally:
+        if parsed.get('staging_dir'):
+            shutil.rmtree(parsed['staging_dir'], ignore_errors=True)
+
+@celery_app.task(bind=True)
+def parse_msg(self, file_path: str, progress_task_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    First pipeline step (CPU queue): parse the .msg file and stage its attachments
+
+    progress_task_id is the ID of the chain's last task, under which
+    progress is reported.
+    """
+    try:
+        return _parse_msg(self, file_path, progress_task_id or self.request.id)
+    except Exception as e:
+        logger.error(f"Error parsing {file_path}: {str(e)}")
+        report_failure(self, e, progress_task_id)
+        raise e
+
+@celery_app.task(bind=True)
+def analyze_submission(self, parsed: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Second pipeline step (remote-call queue): document parsing and AI analysis
+
+    use_cache=False bypasses the LLM response cache (forced re-analysis).
+    """
+    try:
+        result = _analyze_submission(self, parsed, use_cache, self.request.id)
         logger.info(f"Task completed successfully")
         return result
-        
     except Exception as e:
         logger.error(f"Error processing task: {str(e)}")
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'progress': 0,
-                'status': 'failed',
-                'error': str(e)
-            }
+        report_failure(self, e)
+        raise e
+
+@celery_app.task(bind=True)
+def process_reinsurance_msg(self, file_path: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Background task to process .msg file and perform AI analysis
+
+    Runs both pipeline steps in one task. Kept for messages queued before
+    the split; new submissions use celery_app.analysis_pipeline.
+    """
+    try:
+        parsed = _parse_msg(self, file_path, self.request.id)
+        result = _analyze_submission(self, parsed, use_cache, self.request.id)
+        logger.info(f"Task completed successfully")
+        return result
+    except Exception as e:
+        logger.error(f"Error processing task: {str(e)}")
+        report_failure(self, e)
+        raise e
+
+@worker_init.connect
+def require_staging_dir(sender=None, **kwargs):
+    """Refuse to start a worker of the analysis pipeline without ATTACHMENT_STAGING_DIR"""
+    queues = sender.app.amqp.queues
+    consumed = set(queues.consume_from or queues)
+    if not ATTACHMENT_STAGING_DIR and consumed & {CPU_QUEUE, IO_QUEUE}:
+        message = (
+            f"ATTACHMENT_STAGING_DIR is not set: the {CPU_QUEUE} and {IO_QUEUE} workers hand "
+            f"attachments over through it, so it must name a directory both can see"
         )
-        
-        # Clean up temporary file
-        if os.path.exists(file_path):
-            os.unlink(file_path)
-            
-        raise e
\ No newline at end of file
+        logger.critical(message)
+        # Signal handlers' exceptions are only logged; SystemExit stops the worker
+        raise SystemExit(message)
+
+# The source file is removed once the task that reads it has handed off (next step
+# queued, result stored) or has failed for good; a redelivery after a worker crash
+# still finds it
+@task_success.connect(sender=parse_msg)
+@task_success.connect(sender=process_reinsurance_msg)
+def remove_parsed_source(sender=None, **kwargs):
+    _remove_source(sender.request.args[0])
+
+@task_failure.connect(sender=parse_msg)
+@task_failure.connect(sender=process_reinsurance_msg)
+def remove_failed_source(sender=None, args=None, **kwargs):
+    _remove_source((args or [None])[0])
+
+# Terminal events are sent once the result is stored, so /task-result is ready for listeners
+@task_success.connect(sender=analyze_submission)
+@task_success.connect(sender=process_reinsurance_msg)
+def publish_task_completed(sender=None, **kwargs):
+    task_events.publish(sender.request.id, 'completed', progress=100.0, status='Analysis completed')
+
+@task_failure.connect(sender=parse_msg)
+@task_failure.connect(sender=analyze_submission)
+@task_failure.connect(sender=process_reinsurance_msg)
+def publish_task_failed(sender=None, task_id=None, exception=None, kwargs=None, **extra):
+    # A failed parse_msg also fails the rest of its chain, reported under the last task's ID
+    task_id = (kwargs or {}).get('progress_task_id') or task_id
+    task_events.publish(task_id, 'failed', status='Analysis failed', error=str(exception))
@@ -3,62 +3,99 @@ Synchronous version of analysis tasks for production environments without Redis/
 """
 import os
 import logging
-from typing import Dict, Any
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Callable, Optional
 
 logger = logging.getLogger(__name__)
 
-def process_reinsurance_msg_sync(msg_file_path: str) -> Dict[str, Any]:
+# How long a finished analysis waits for the background Cloudinary archival
+ARCHIVE_UPLOAD_WAIT_SECONDS = float(os.getenv("ARCHIVE_UPLOAD_WAIT_SECONDS", "60"))
+
+def process_reinsurance_msg_sync(
+    msg_file_path: str,
+    progress_callback: Optional[Callable[[float, str], None]] = None,
+    use_cache: bool = True,
+    document_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    token_callback: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
     """
     Synchronous version of the reinsurance processing task
+    
+    Args:
+        msg_file_path: Path to the .msg file (removed once processing ends)
+        progress_callback: Optional callable receiving (progress, status),
+            mirroring the PROGRESS updates of the Celery task
+        use_cache: Set to False to bypass the LLM response cache
+        document_callback: Optional callable receiving each parsed document
+            as soon as it completes
+        token_callback: Optional callable receiving the analysis response
+            tokens as they stream in
     """
+    def report_progress(progress: float, status: str):
+        if progress_callback:
+            try:
+                progress_callback(progress, status)
+            except Exception as callback_error:
+                logger.warning(f"Progress callback failed: {callback_error}")
+    
     try:
-        # Import services
+        # Import services (shared instances, built once per process)
         from services.msg_reader_service import MSGFileReader
-        from services.cloudinary_service import CloudinaryService
-        from services.document_processing_service import DocumentProcessingService
-        from services.ai_analysis_service import AIAnalysisService
+        from services.service_registry import (
+            get_cloudinary_service,
+            get_document_processing_service,
+            get_ai_analysis_service
+        )
         
         logger.info(f"Starting sync processing of {msg_file_path}")
         
         # Step 1: Read MSG file
+        report_progress(10, 'Processing MSG file')
         msg_reader = MSGFileReader(msg_file_path)
         msg_data = msg_reader.read_msg_file()
         
         if not msg_data:
             raise Exception("Failed to read MSG file - file may be corrupted or invalid")
         
-        # Step 2: Upload attachments to Cloudinary
-        cloudinary_service = CloudinaryService()
-        uploaded_attachments = []
-        
-        if msg_data.get('attachments'):
-            uploaded_attachments = cloudinary_service.upload_multiple_attachments(
-                msg_data['attachments']
-            )
+        # Step 2: Archive attachments to Cloudinary in the background
+        report_progress(30, 'Processing attachments')
+        cloudinary_service = get_cloudinary_service()
+        attachment_files = msg_reader.get_attachments_for_cloudinary()
+        upload_future = None
         
-        # Step 3: Process documents with LlamaParse
-        doc_processor = DocumentProcessingService()
-        cloudinary_urls = []
+        if attachment_files:
+            upload_future = cloudinary_service.upload_multiple_attachments_in_background(attachment_files)
         
-        for attachment in uploaded_attachments:
-            if attachment['status'] == 'success':
-                cloudinary_urls.append(attachment['upload_result']['secure_url'])
+        # Step 3: Process documents with LlamaParse from in-memory bytes
+        report_progress(50, f'Processing {len(attachment_files)} documents')
+        doc_processor = get_document_processing_service()
         
         processed_docs = []
-        if cloudinary_urls:
-            processed_docs = doc_processor.process_documents(cloudinary_urls)
+        if attachment_files:
+            processed_docs = doc_processor.process_attachments(attachment_files, document_callback=document_callback)
         
-        # Step 4: Generate AI analysis
-        ai_service = AIAnalysisService()
+        # Step 4: Generate AI analysis from the documents parsed in step 3
+        report_progress(70, 'Performing AI analysis with document processing')
+        ai_service = get_ai_analysis_service()
         analysis_result = ai_service.analyze_reinsurance_submission(
             email_data=msg_data,
-            attachment_urls=cloudinary_urls
+            parsed_documents=processed_docs,
+            use_cache=use_cache,
+            token_callback=token_callback
         )
         
-        # Use comprehensive JSON serialization
-        from utils.json_serializer import make_json_serializable
+        # Step 5: Collect the archival upload results
+        uploaded_attachments = []
+        if upload_future is not None:
+            report_progress(90, 'Archiving attachments')
+            try:
+                uploaded_attachments = upload_future.result(timeout=ARCHIVE_UPLOAD_WAIT_SECONDS)
+            except FutureTimeoutError:
+                logger.warning("Cloudinary archival still running, returning result without upload details")
+            except Exception as upload_error:
+                logger.warning(f"Failed to upload some attachments: {upload_error}")
         
-        # Compile final result (ensure all values are JSON serializable)
+        # Compile final result; model_dump(mode="json") leaves only JSON-compatible values
         result = {
             "email_data": {
                 "subject": str(msg_data.get('subject', '')),
@@ -66,16 +103,13 @@ def process_reinsurance_msg_sync(msg_file_path: str) -> Dict[str, Any]:
                 "date": str(msg_data.get('date', '')),
                 "body": str(msg_data.get('body', ''))[:1000] + '...' if len(str(msg_data.get('body', ''))) > 1000 else str(msg_data.get('body', ''))
             },
-            "attachments_processed": len(uploaded_attachments),
+            "attachments_processed": len(attachment_files),
             "attachments_uploaded": len([a for a in uploaded_attachments if a['status'] == 'success']),
             "documents_analyzed": len(processed_docs),
-            "reinsurance_analysis": make_json_serializable(analysis_result),
+            "reinsurance_analysis": analysis_result.model_dump(mode="json"),
             "processing_mode": "synchronous"
         }
         
-        # Ensure the entire result is JSON serializable
-        result = make_json_serializable(result)
-        
         logger.info(f"Sync processing completed successfully for {msg_file_path}")
         return result
         
@@ -30,7 +30,7 @@ def test_redis_connection():
 def test_tasks_import():
     """Test if tasks can be imported."""
     try:
-        from tasks.analysis_tasks import process_reinsurance_msg
+        from tasks.analysis_tasks import parse_msg, analyze_submission, process_reinsurance_msg
         print("✅ Tasks imported successfully")
         return True
     except Exception as e:
@@ -0,0 +1,76 @@
+"""
+Storage of batch submissions and the tasks they contain
+"""
+import json
+import time
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "batch:"
+
+
+class BatchStore:
+    """
+    Maps batch IDs to their items (filename, task ID, submission status)
+
+    Uses Redis when a client is given (shared by all API workers, async mode)
+    and a process-local map otherwise (sync mode). Batches expire after
+    ttl_seconds, matching the lifetime of the task results they point to.
+    """
+
+    def __init__(self, redis_client=None, ttl_seconds: int = 3600):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self._local = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def create(self, batch_id: str, batch: Dict[str, Any]):
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch.get("items", []))
+        if self.redis is not None:
+            self.redis.set(KEY_PREFIX + batch_id, json.dumps(batch), ex=self.ttl_seconds)
+            return
+        with self._lock:
+            self._purge_expired()
+            self._local[batch_id] = (batch, time.time() + self.ttl_seconds)
+
+    def update(self, batch_id: str, batch: Dict[str, Any]):
+        """Replace a stored batch, keeping its expiry"""
+        if self.redis is not None:
+            self.redis.set(KEY_PREFIX + batch_id, json.dumps(batch), xx=True, keepttl=True)
+            return
+        with self._lock:
+            entry = self._local.get(batch_id)
+            if entry is not None:
+                self._local[batch_id] = (batch, entry[1])
+
+    def get(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        if self.redis is not None:
+            value = self.redis.get(KEY_PREFIX + batch_id)
+            return json.loads(value) if value is not None else None
+        with self._lock:
+            entry = self._local.get(batch_id)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[0]
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [batch_id for batch_id, (_, expires_at) in self._local.items() if expires_at <= now]
+        for batch_id in expired:
+            del self._local[batch_id]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "redis" if self.redis is not None else "memory",
+                "local_batches": len(self._local),
+                "batches_submitted": self.batches,
+                "items_submitted": self.items,
+            }
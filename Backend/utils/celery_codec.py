@@ -0,0 +1,225 @@
+"""
+Compact Celery codecs for task messages and results, with size metrics
+
+Celery's default JSON codec stores every result uncompressed in Redis.
+The codecs registered here are opt-in (CELERY_TASK_CODEC /
+CELERY_RESULT_CODEC):
+
+    msgpack        MessagePack (via ormsgpack), wire-compatible with kombu's msgpack
+    msgpack-zstd   MessagePack compressed with zstd
+    orjson-zstd    JSON (via orjson) compressed with zstd
+
+Values that the encoders do not support natively are encoded as strings,
+the same fallback the JSON result path uses. Decoded datetimes are ISO
+strings rather than datetime objects.
+"""
+import os
+import itertools
+import threading
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CODEC_ZSTD_LEVEL = int(os.getenv("CELERY_CODEC_ZSTD_LEVEL", "3"))
+
+METRICS_KEY = "celery-codec-metrics"
+
+_registered = False
+_register_lock = threading.Lock()
+
+
+def _default(obj: Any) -> str:
+    return str(obj)
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    import zstandard
+
+    # Compressor objects are not safe to share between threads
+    return zstandard.ZstdCompressor(level=CODEC_ZSTD_LEVEL).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def _msgpack_dumps(obj: Any) -> bytes:
+    import ormsgpack
+
+    return ormsgpack.packb(obj, default=_default, option=ormsgpack.OPT_NON_STR_KEYS)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    import ormsgpack
+
+    return ormsgpack.unpackb(data)
+
+
+def _orjson_dumps(obj: Any) -> bytes:
+    import orjson
+
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _orjson_loads(data: bytes) -> Any:
+    import orjson
+
+    return orjson.loads(data)
+
+
+# name -> (encoder, decoder, content type)
+CODECS = {
+    "msgpack": (
+        _msgpack_dumps,
+        _msgpack_loads,
+        "application/x-msgpack",
+    ),
+    "msgpack-zstd": (
+        lambda obj: _zstd_compress(_msgpack_dumps(obj)),
+        lambda data: _msgpack_loads(_zstd_decompress(data)),
+        "application/x-msgpack+zstd",
+    ),
+    "orjson-zstd": (
+        lambda obj: _zstd_compress(_orjson_dumps(obj)),
+        lambda data: _orjson_loads(_zstd_decompress(data)),
+        "application/x-orjson+zstd",
+    ),
+}
+
+
+def register_codecs():
+    """Register the codecs with kombu (idempotent)"""
+    global _registered
+    from kombu.serialization import register
+
+    with _register_lock:
+        if _registered:
+            return
+        for name, (encoder, decoder, content_type) in CODECS.items():
+            register(name, encoder, decoder, content_type=content_type, content_encoding="binary")
+        _registered = True
+
+
+def resolve_codec(name: Optional[str]) -> str:
+    """
+    Validate a configured codec name, falling back to "json"
+
+    A codec whose libraries are not installed falls back too, so enabling
+    one on a host without them does not stop the workers from starting.
+    """
+    name = (name or "json").strip().lower()
+    if name == "json":
+        return name
+    if name not in CODECS:
+        logger.warning(f"Unknown Celery codec '{name}', using json")
+        return "json"
+    try:
+        CODECS[name][0]({"probe": 1})
+    except ImportError as e:
+        logger.warning(f"Celery codec '{name}' unavailable ({e}), using json")
+        return "json"
+    return name
+
+
+def encoded_size(payload: Any, codec: str) -> int:
+    """Size in bytes of payload encoded with a registered codec"""
+    from kombu.serialization import dumps
+
+    _, _, data = dumps(payload, serializer=codec)
+    return len(data)
+
+
+class CodecMetrics:
+    """
+    Per-task sizes of task messages and results
+
+    One payload in sample_every is measured, both as JSON and with the
+    configured codec; measuring re-encodes the payload twice, so the rest
+    are skipped. Counters go to a Redis hash when a client is available, so
+    sizes recorded by the workers can be read by the API; otherwise they
+    are kept in this process.
+    """
+
+    def __init__(self, redis_client_factory: Optional[Callable[[], Any]] = None, sample_every: int = 1):
+        self._redis_client_factory = redis_client_factory
+        self.sample_every = max(1, sample_every)
+        self._seen = itertools.count()
+        self._local: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _redis(self):
+        if self._redis_client_factory is None:
+            return None
+        try:
+            return self._redis_client_factory()
+        except Exception:
+            return None
+
+    def record(self, task_name: str, kind: str, payload: Any, codec: str):
+        """
+        Measure payload, if sampled, and add it to the counters of task_name
+
+        kind is "message" (published task) or "result" (stored result).
+        Measurement errors are logged and ignored.
+        """
+        if next(self._seen) % self.sample_every:
+            return
+        try:
+            json_bytes = encoded_size(payload, "json")
+            stored_bytes = json_bytes if codec == "json" else encoded_size(payload, codec)
+        except Exception as e:
+            logger.debug(f"Could not measure {kind} of {task_name}: {e}")
+            return
+
+        logger.debug(f"{task_name} {kind}: {json_bytes} bytes as json, {stored_bytes} bytes as {codec}")
+        prefix = f"{task_name}|{kind}|"
+        increments = {"sampled": 1, "json_bytes": json_bytes, "stored_bytes": stored_bytes}
+
+        client = self._redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for field, value in increments.items():
+                    pipe.hincrby(METRICS_KEY, prefix + field, value)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.debug(f"Could not record codec metrics in Redis: {e}")
+
+        with self._lock:
+            for field, value in increments.items():
+                self._local[prefix + field] = self._local.get(prefix + field, 0) + value
+
+    def stats(self) -> Dict[str, Any]:
+        counters = None
+        client = self._redis()
+        if client is not None:
+            try:
+                counters = {
+                    (k.decode() if isinstance(k, bytes) else k): int(v)
+                    for k, v in client.hgetall(METRICS_KEY).items()
+                }
+            except Exception:
+                counters = None
+        if counters is None:
+            with self._lock:
+                counters = dict(self._local)
+
+        tasks: Dict[str, Dict[str, Any]] = {}
+        for key, value in counters.items():
+            task_name, kind, field = key.rsplit("|", 2)
+            tasks.setdefault(task_name, {}).setdefault(kind, {})[field] = value
+
+        for kinds in tasks.values():
+            for entry in kinds.values():
+                count = entry.get("sampled", 0) or 1
+                json_bytes = entry.get("json_bytes", 0)
+                stored_bytes = entry.get("stored_bytes", 0)
+                entry["avg_json_bytes"] = round(json_bytes / count)
+                entry["avg_stored_bytes"] = round(stored_bytes / count)
+                entry["compression_ratio"] = round(json_bytes / stored_bytes, 2) if stored_bytes else None
+        return tasks
+
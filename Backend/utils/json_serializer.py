@@ -1,19 +1,63 @@
 """
 JSON serialization utilities for handling complex objects
+
+dumps_json serializes in a single pass: Pydantic models via
+model_dump(mode="json") and everything else via orjson, with a default
+hook for the types orjson does not handle natively.
+make_json_serializable is the older recursive walk, kept for callers
+outside this package.
 """
 import json
 import logging
 from datetime import datetime, date
 from decimal import Decimal
-from typing import Any, Dict, List
+from typing import Any
 from uuid import UUID
 
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
 logger = logging.getLogger(__name__)
 
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _orjson_default(obj: Any) -> Any:
+    """Fallback for types orjson cannot serialize natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # Same fallback as make_json_serializable: custom objects become strings
+    logger.debug(f"Converting non-serializable object {type(obj)} to string")
+    return str(obj)
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    Serialize an object to JSON bytes in a single pass
+    
+    Args:
+        obj: Object to serialize (Pydantic models, dicts, lists, datetimes, ...)
+        
+    Returns:
+        UTF-8 encoded JSON
+    """
+    return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with dumps_json, for large result payloads"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
 def make_json_serializable(obj: Any) -> Any:
     """
     Recursively convert an object to be JSON serializable
     
+    Prefer dumps_json, which serializes in one pass.
+    
     Args:
         obj: Object to convert
         
@@ -81,8 +125,10 @@ def safe_json_dumps(obj: Any, **kwargs) -> str:
         JSON string representation
     """
     try:
-        serializable_obj = make_json_serializable(obj)
-        return json.dumps(serializable_obj, **kwargs)
+        if not kwargs:
+            return dumps_json(obj).decode()
+        # json.dumps formatting options (indent, sort_keys, ...) on the single-pass output
+        return json.dumps(orjson.loads(dumps_json(obj)), **kwargs)
     except Exception as e:
         logger.error(f"Failed to serialize object to JSON: {e}")
         # Return a fallback JSON representation
@@ -103,7 +149,7 @@ def validate_json_serializable(obj: Any) -> bool:
         True if serializable, False otherwise
     """
     try:
-        json.dumps(make_json_serializable(obj))
+        dumps_json(obj)
         return True
     except Exception:
         return False
\ No newline at end of file
@@ -0,0 +1,58 @@
+"""
+Thread-safe token bucket rate limiter for outbound API calls
+"""
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate_per_minute` calls per minute with bursts of
+    up to `burst` calls. Shared by all threads in a process.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int = 1, name: str = "rate_limiter"):
+        self.rate_per_second = rate_per_minute / 60.0 if rate_per_minute > 0 else 0
+        self.capacity = max(1, burst)
+        self.name = name
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+
+    def acquire(self):
+        """Block until a call is allowed (no-op when the rate is unlimited)"""
+        if not self.rate_per_second:
+            return
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated_at) * self.rate_per_second
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        self.waits += 1
+                        self.total_wait_seconds += waited
+                    return
+                delay = (1 - self._tokens) / self.rate_per_second
+            time.sleep(delay)
+            waited += delay
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_minute": self.rate_per_second * 60,
+                "burst": self.capacity,
+                "throttled_calls": self.waits,
+                "total_wait_seconds": round(self.total_wait_seconds, 3),
+            }
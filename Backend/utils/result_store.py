@@ -0,0 +1,189 @@
+"""
+Bounded result store for sync-mode task results (production fallback)
+"""
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.disk_cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# States of tasks still running; their entries are never evicted for space
+NON_TERMINAL_STATES = ("PENDING", "PROGRESS")
+
+
+class ResultStore:
+    """
+    In-memory task result store with LRU + TTL eviction and a byte budget
+
+    Entries expire after ttl_seconds (matching Celery's result_expires) and
+    the least recently used entries are evicted once the estimated size of
+    all stored results exceeds max_bytes. Entries of running tasks
+    (PENDING, PROGRESS) are exempt from that eviction: dropping one would
+    report a live task as not found. When spill_path is set, persisted
+    entries are also written to a SQLite file so they survive restarts and
+    memory evictions.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_bytes: int = 256 * 1024 * 1024,
+        spill_path: Optional[str] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._disk = None
+        if spill_path:
+            try:
+                self._disk = DiskCache(spill_path, ttl_seconds=ttl_seconds, name="result_store")
+            except Exception as e:
+                logger.warning(f"Result spill-to-disk disabled, cannot open {spill_path}: {e}")
+
+    def set(self, key: str, value: Dict[str, Any], persist: bool = True):
+        """
+        Store a result
+
+        Args:
+            key: Task ID
+            value: JSON-serializable result entry
+            persist: Also write the entry to disk when spill-to-disk is enabled.
+                Transient entries (e.g. progress updates) can skip this.
+        """
+        payload = json.dumps(value, default=str)
+        size = len(payload)
+
+        if persist and self._disk is not None:
+            try:
+                self._disk.set(key, value)
+            except Exception as e:
+                logger.warning(f"Failed to persist result {key}: {e}")
+
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                logger.warning(f"Result {key} ({size} bytes) exceeds the store budget, not kept in memory")
+                self.evictions += 1
+                return
+            self._entries[key] = (value, size, time.time() + self.ttl_seconds)
+            self._bytes += size
+            self._evict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the stored result for key, or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                if time.time() <= expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+                self.expirations += 1
+
+        if self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                expires_at = self._disk.expires_at(key) or time.time() + self.ttl_seconds
+                with self._lock:
+                    self.hits += 1
+                    self._promote(key, value, expires_at)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            self._remove(key)
+        if self._disk is not None:
+            self._disk.delete(key)
+        return entry[0] if entry is not None else default
+
+    def __setitem__(self, key: str, value: Dict[str, Any]):
+        self.set(key, value)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() <= entry[2]:
+                return True
+        return self._disk is not None and key in self._disk
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _promote(self, key: str, value: Dict[str, Any], expires_at: float):
+        """Load a disk entry back into memory, keeping its original expiry"""
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, size, expires_at)
+        self._bytes += size
+        self._evict()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def _evict(self):
+        """Drop expired entries, then least recently used finished ones over budget"""
+        now = time.time()
+        expired = [key for key, (_, _, expires_at) in self._entries.items() if expires_at < now]
+        for key in expired:
+            self._remove(key)
+            self.expirations += 1
+
+        if self._bytes <= self.max_bytes:
+            return
+        for key, (value, size, _) in list(self._entries.items()):
+            if self._bytes <= self.max_bytes:
+                break
+            if value.get("status") in NON_TERMINAL_STATES:
+                continue
+            self._remove(key)
+            self.evictions += 1
+            logger.info(f"Evicted result {key} ({size} bytes) from memory")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+        if self._disk is not None:
+            stats["disk"] = self._disk.stats()
+        return stats
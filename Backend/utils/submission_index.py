@@ -0,0 +1,168 @@
+"""
+Content-addressed index of submitted .msg files for deduplication
+"""
+import time
+import threading
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "submission:"
+QUEUED_PREFIX = "submission-queued:"
+
+# Replace a digest's owner only if it is still the owner that was checked
+_REPLACE_OWNER_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class SubmissionIndex:
+    """
+    Maps submission content digests to the task that processes them
+
+    Uses Redis when a client is given (shared by all API workers, async mode)
+    and a process-local map otherwise (sync mode). Entries expire after
+    ttl_seconds, matching the lifetime of the task results they point to.
+
+    Tasks that claimed digests are also marked as queued for
+    queue_timeout_seconds, so a task that has not started yet can be told
+    apart from an unknown or lost one (Celery reports PENDING for both).
+    """
+
+    def __init__(self, redis_client=None, ttl_seconds: int = 3600, queue_timeout_seconds: int = 1800):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._local = {}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.attached = 0
+
+    def claim(
+        self,
+        digests: List[str],
+        task_id: str,
+        is_reusable: Callable[[str], bool]
+    ) -> Optional[str]:
+        """
+        Claim digests for task_id unless a reusable task already owns one
+
+        Args:
+            digests: Content digests identifying the submission
+            task_id: ID of the task that would process a new submission
+            is_reusable: Returns True if an existing task ID is finished
+                successfully or still in flight
+
+        Returns:
+            The existing task ID to reuse, or None if task_id now owns all digests
+        """
+        claimed = []
+        for digest in digests:
+            while True:
+                owner = self._set_if_absent(digest, task_id)
+                if owner is None or owner == task_id:
+                    break
+                if is_reusable(owner):
+                    # Roll back digests claimed for the new task
+                    for claimed_digest in claimed:
+                        self._delete_if_owner(claimed_digest, task_id)
+                    return owner
+                # Owner failed or expired: take the digest over, unless a
+                # concurrent submission replaced that owner first
+                if self._replace_owner(digest, owner, task_id):
+                    break
+            claimed.append(digest)
+        return None
+
+    def mark_queued(self, task_id: str):
+        """Record that task_id was handed to a new submission and should start soon"""
+        if self.redis is not None:
+            self.redis.set(QUEUED_PREFIX + task_id, 1, ex=self.queue_timeout_seconds)
+            return
+        with self._lock:
+            self._local[QUEUED_PREFIX + task_id] = (task_id, time.time() + self.queue_timeout_seconds)
+
+    def is_queued(self, task_id: str) -> bool:
+        """True if task_id was marked queued within queue_timeout_seconds"""
+        if self.redis is not None:
+            return bool(self.redis.exists(QUEUED_PREFIX + task_id))
+        with self._lock:
+            entry = self._local.get(QUEUED_PREFIX + task_id)
+            return entry is not None and entry[1] > time.time()
+
+    def release(self, digests: List[str], task_id: str):
+        """Forget digests owned by task_id (e.g. when submission fails)"""
+        for digest in digests:
+            self._delete_if_owner(digest, task_id)
+
+    def _set_if_absent(self, digest: str, task_id: str) -> Optional[str]:
+        """Set digest -> task_id if unset; return the current owner otherwise"""
+        if self.redis is not None:
+            key = KEY_PREFIX + digest
+            if self.redis.set(key, task_id, nx=True, ex=self.ttl_seconds):
+                return None
+            owner = self.redis.get(key)
+            if owner is None:
+                return self._set_if_absent(digest, task_id)
+            return owner.decode("utf-8") if isinstance(owner, bytes) else owner
+
+        with self._lock:
+            self._purge_expired()
+            entry = self._local.get(digest)
+            if entry is not None and entry[1] > time.time():
+                return entry[0]
+            self._local[digest] = (task_id, time.time() + self.ttl_seconds)
+            return None
+
+    def _replace_owner(self, digest: str, old_task_id: str, task_id: str) -> bool:
+        """Atomically set digest -> task_id if old_task_id still owns it"""
+        if self.redis is not None:
+            return bool(self.redis.eval(
+                _REPLACE_OWNER_SCRIPT, 1, KEY_PREFIX + digest, old_task_id, task_id, self.ttl_seconds
+            ))
+        with self._lock:
+            entry = self._local.get(digest)
+            if entry is None or entry[0] != old_task_id:
+                return False
+            self._local[digest] = (task_id, time.time() + self.ttl_seconds)
+            return True
+
+    def _delete_if_owner(self, digest: str, task_id: str):
+        if self.redis is not None:
+            key = KEY_PREFIX + digest
+            owner = self.redis.get(key)
+            if owner is not None and (owner.decode("utf-8") if isinstance(owner, bytes) else owner) == task_id:
+                self.redis.delete(key)
+            return
+        with self._lock:
+            entry = self._local.get(digest)
+            if entry is not None and entry[0] == task_id:
+                del self._local[digest]
+            self._purge_expired()
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [digest for digest, (_, expires_at) in self._local.items() if expires_at <= now]
+        for digest in expired:
+            del self._local[digest]
+
+    def record_hit(self, finished: bool):
+        with self._lock:
+            if finished:
+                self.duplicates += 1
+            else:
+                self.attached += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "redis" if self.redis is not None else "memory",
+                "local_entries": len(self._local),
+                "duplicates_returned": self.duplicates,
+                "attached_in_flight": self.attached,
+            }
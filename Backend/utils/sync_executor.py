@@ -0,0 +1,84 @@
+"""
+Bounded background executor for sync-mode processing (no Redis/Celery)
+"""
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the executor has no free worker or queue slot"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool that accepts at most max_workers + max_queue tasks at a time
+
+    Submissions beyond that limit are rejected immediately instead of being
+    queued without bound, so callers can apply backpressure.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 8, name: str = "sync-analysis"):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Schedule fn(*args, **kwargs) on the pool
+
+        Raises:
+            QueueFullError: If all worker and queue slots are taken
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(
+                f"Processing queue is full ({self.max_workers} running, {self.max_queue} queued)"
+            )
+
+        with self._lock:
+            self.pending += 1
+
+        def run():
+            with self._lock:
+                self.pending -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        try:
+            return self._executor.submit(run)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,269 @@
+"""
+Task event broadcasting for the /task-events Server-Sent Events stream
+
+Pipelines publish stage transitions, per-document parse completions and
+streamed LLM tokens for a task. Celery workers publish over Redis pub/sub
+so the API process can relay them; in sync mode events go through an
+in-process broadcaster. Publishing never raises, so a missing listener or
+a broker hiccup cannot fail an analysis.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Set
+
+from utils.redis_checker import is_redis_available
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENT_CHANNEL_PREFIX = "task-events:"
+TASK_EVENT_QUEUE_SIZE = int(os.getenv("TASK_EVENT_QUEUE_SIZE", "1000"))
+# Streamed tokens are coalesced into one event per interval
+TASK_EVENT_TOKEN_FLUSH_SECONDS = float(os.getenv("TASK_EVENT_TOKEN_FLUSH_SECONDS", "0.1"))
+
+# Events after which a task publishes nothing more
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+class _QueueSubscription:
+    """Receives the in-process events of one task on the subscriber's event loop"""
+
+    def __init__(self, broadcaster: "InProcessBroadcaster", task_id: str):
+        self.broadcaster = broadcaster
+        self.task_id = task_id
+        self.loop = None
+        self.queue = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=TASK_EVENT_QUEUE_SIZE)
+        self.broadcaster._add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broadcaster._remove(self)
+
+    def deliver(self, event: Dict[str, Any]):
+        # Runs on the subscriber's loop; a slow client loses token events, not the stream
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroadcaster:
+    """Fan-out of task events to subscribers in this process (sync mode)"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[_QueueSubscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers.get(task_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Subscriber's loop already closed
+                pass
+
+    def subscribe(self, task_id: str) -> _QueueSubscription:
+        return _QueueSubscription(self, task_id)
+
+    def _add(self, subscription: _QueueSubscription):
+        with self._lock:
+            self._subscribers.setdefault(subscription.task_id, set()).add(subscription)
+
+    def _remove(self, subscription: _QueueSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.task_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.task_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "in_process",
+                "published": self.published,
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+            }
+
+
+class _RedisSubscription:
+    """Receives the events of one task from its Redis pub/sub channel"""
+
+    def __init__(self, broadcaster: "RedisBroadcaster", task_id: str):
+        self.broadcaster = broadcaster
+        self.channel = f"{TASK_EVENT_CHANNEL_PREFIX}{task_id}"
+        self.pubsub = None
+
+    async def __aenter__(self):
+        self.pubsub = self.broadcaster.async_client().pubsub()
+        await self.pubsub.subscribe(self.channel)
+        self.broadcaster.subscribers += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broadcaster.subscribers -= 1
+        try:
+            await self.pubsub.unsubscribe(self.channel)
+            await self.pubsub.aclose()
+        except Exception as e:
+            logger.debug(f"Error closing pub/sub for {self.channel}: {e}")
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            if message is not None and message.get('type') == 'message':
+                return json.loads(message['data'])
+
+
+class RedisBroadcaster:
+    """Task events over Redis pub/sub, shared by Celery workers and the API"""
+
+    def __init__(self, redis_url: str):
+        import redis
+
+        self.redis_url = redis_url
+        self._client = redis.from_url(redis_url)
+        self._async_client = None
+        self.published = 0
+        self.subscribers = 0
+
+    def async_client(self):
+        # Created on first subscription, inside the API's event loop
+        if self._async_client is None:
+            import redis.asyncio
+
+            self._async_client = redis.asyncio.from_url(self.redis_url)
+        return self._async_client
+
+    def publish(self, task_id: str, event: Dict[str, Any]):
+        self._client.publish(f"{TASK_EVENT_CHANNEL_PREFIX}{task_id}", json.dumps(event, default=str))
+        self.published += 1
+
+    def subscribe(self, task_id: str) -> _RedisSubscription:
+        return _RedisSubscription(self, task_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "published": self.published,
+            "subscribers": self.subscribers,
+        }
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+def get_broadcaster():
+    """Return the process-wide broadcaster: Redis pub/sub when reachable, in-process otherwise"""
+    global _broadcaster
+    with _broadcaster_lock:
+        if _broadcaster is None:
+            if is_redis_available():
+                _broadcaster = RedisBroadcaster(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+            else:
+                _broadcaster = InProcessBroadcaster()
+        return _broadcaster
+
+
+def publish(task_id: str, event_type: str, **data):
+    """Publish one event for task_id; failures are logged and ignored"""
+    event = {"type": event_type, "task_id": task_id, "timestamp": time.time(), **data}
+    try:
+        get_broadcaster().publish(task_id, event)
+    except Exception as e:
+        logger.warning(f"Could not publish {event_type} event for task {task_id}: {e}")
+
+
+def publish_stage(task_id: str, progress: float, status: str):
+    publish(task_id, "stage", progress=progress, status=status)
+
+
+def document_publisher(task_id: str) -> Callable[[Dict[str, Any]], None]:
+    """
+    Callback publishing a 'document' event as each parsed document completes
+
+    Safe to call from the parsing worker threads.
+    """
+    lock = threading.Lock()
+    completed = [0]
+
+    def on_document(document: Dict[str, Any]):
+        with lock:
+            completed[0] += 1
+            count = completed[0]
+        publish(
+            task_id,
+            "document",
+            filename=document.get('filename') or document.get('url'),
+            status=document.get('status'),
+            cache_hit=document.get('metadata', {}).get('cache_hit', False),
+            characters=len(document.get('extracted_text') or ''),
+            completed=count
+        )
+
+    return on_document
+
+
+class TokenPublisher:
+    """
+    Callback publishing streamed LLM tokens as 'token' events
+
+    Tokens are buffered and sent at most every flush_interval seconds, so a
+    long completion produces tens of events rather than thousands. Call
+    flush() once the stream ends.
+    """
+
+    def __init__(self, task_id: str, flush_interval: float = TASK_EVENT_TOKEN_FLUSH_SECONDS):
+        self.task_id = task_id
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, token: str):
+        with self._lock:
+            self._buffer.append(token)
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            text = self._drain()
+        publish(self.task_id, "token", text=text)
+
+    def flush(self):
+        with self._lock:
+            text = self._drain()
+        if text:
+            publish(self.task_id, "token", text=text)
+
+    def _drain(self) -> str:
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        return text
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode an event as a Server-Sent Events message named after its type"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,222 @@
+"""
+Streaming upload helpers for large .msg submissions
+"""
+import os
+import hashlib
+import zipfile
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Upload limits (configurable through environment variables)
+MAX_UPLOAD_SIZE_BYTES = int(float(os.getenv("MAX_FILE_SIZE_MB", "50")) * 1024 * 1024)
+UPLOAD_CHUNK_SIZE_BYTES = int(os.getenv("UPLOAD_CHUNK_SIZE_KB", "1024")) * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured maximum size"""
+
+    def __init__(self, size: int, max_size: int):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(
+            f"File exceeds maximum upload size of {round(max_size / (1024 * 1024), 2)} MB"
+        )
+
+
+class UploadMetrics:
+    """
+    Thread-safe counters for uploads currently being written to disk
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bytes_in_flight = 0
+        self.active_uploads = 0
+        self.completed_uploads = 0
+        self.rejected_uploads = 0
+        self.total_bytes_written = 0
+
+    def start(self):
+        with self._lock:
+            self.active_uploads += 1
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes_in_flight += count
+
+    def finish(self, written: int, rejected: bool = False):
+        with self._lock:
+            self.active_uploads -= 1
+            self.bytes_in_flight -= written
+            if rejected:
+                self.rejected_uploads += 1
+            else:
+                self.completed_uploads += 1
+                self.total_bytes_written += written
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "bytes_in_flight": self.bytes_in_flight,
+                "active_uploads": self.active_uploads,
+                "completed_uploads": self.completed_uploads,
+                "rejected_uploads": self.rejected_uploads,
+                "total_bytes_written": self.total_bytes_written,
+                "max_upload_size_bytes": MAX_UPLOAD_SIZE_BYTES,
+                "chunk_size_bytes": UPLOAD_CHUNK_SIZE_BYTES,
+            }
+
+
+upload_metrics = UploadMetrics()
+
+
+async def stream_upload_to_tempfile(
+    upload: UploadFile,
+    suffix: str = ".msg",
+    max_size: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    hasher=None
+) -> str:
+    """
+    Copy an uploaded file to a temporary file in fixed-size chunks
+
+    Only one chunk is held in memory at a time, so peak memory per upload
+    does not grow with the file size. Disk writes and hashing run in the
+    thread pool so they do not block the event loop.
+
+    Args:
+        upload: FastAPI upload to read from
+        suffix: Suffix for the temporary file
+        max_size: Maximum accepted size in bytes (defaults to MAX_FILE_SIZE_MB)
+        chunk_size: Read size in bytes (defaults to UPLOAD_CHUNK_SIZE_KB)
+        hasher: Optional hashlib object updated with every chunk, so the
+            content digest is computed without re-reading the file
+
+    Returns:
+        Path of the temporary file. The caller is responsible for removing it.
+
+    Raises:
+        UploadTooLargeError: If the upload is larger than max_size
+    """
+    if max_size is None:
+        max_size = MAX_UPLOAD_SIZE_BYTES
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE_BYTES
+
+    # Reject early when the multipart parser already knows the size
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > max_size:
+        upload_metrics.start()
+        upload_metrics.finish(0, rejected=True)
+        raise UploadTooLargeError(declared_size, max_size)
+
+    def write_chunk(chunk: bytes):
+        temp_file.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+    upload_metrics.start()
+    written = 0
+    temp_file = await run_in_threadpool(tempfile.NamedTemporaryFile, delete=False, suffix=suffix)
+    try:
+        try:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                upload_metrics.add_bytes(len(chunk))
+                if written > max_size:
+                    raise UploadTooLargeError(written, max_size)
+                await run_in_threadpool(write_chunk, chunk)
+        finally:
+            await run_in_threadpool(temp_file.close)
+    except Exception:
+        upload_metrics.finish(written, rejected=True)
+        try:
+            os.unlink(temp_file.name)
+        except OSError:
+            pass
+        raise
+
+    upload_metrics.finish(written)
+    logger.info(f"Streamed {written} bytes from {upload.filename} to {temp_file.name}")
+    return temp_file.name
+
+
+def extract_zip_members(
+    zip_path: str,
+    suffix: str = ".msg",
+    max_size: Optional[int] = None,
+    max_members: Optional[int] = None,
+    chunk_size: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Copy the members of a zip archive ending in suffix to temporary files
+
+    Members are decompressed in chunks and each is held to the same size
+    limit as a direct upload, whatever its declared size, so a crafted
+    archive cannot exhaust memory or disk. Directories, other file types
+    and macOS resource forks are skipped.
+
+    Args:
+        zip_path: Path of the zip archive
+        suffix: Only members whose name ends with this are extracted
+        max_size: Maximum size of one member (defaults to MAX_FILE_SIZE_MB)
+        max_members: Stop after this many members
+        chunk_size: Read size in bytes (defaults to UPLOAD_CHUNK_SIZE_KB)
+
+    Returns:
+        One dict per member with 'filename' and either 'path' and 'sha256'
+        or 'error'. The caller is responsible for removing the files.
+
+    Raises:
+        zipfile.BadZipFile: If the file is not a zip archive
+    """
+    if max_size is None:
+        max_size = MAX_UPLOAD_SIZE_BYTES
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE_BYTES
+    members = []
+
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or not name.lower().endswith(suffix) or "__MACOSX/" in name:
+                continue
+            if max_members is not None and len(members) >= max_members:
+                break
+
+            filename = os.path.basename(name)
+            if info.file_size > max_size:
+                members.append({"filename": filename, "error": str(UploadTooLargeError(info.file_size, max_size))})
+                continue
+
+            hasher = hashlib.sha256()
+            written = 0
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+            try:
+                with temp_file, archive.open(info) as source:
+                    while True:
+                        chunk = source.read(chunk_size)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        if written > max_size:
+                            raise UploadTooLargeError(written, max_size)
+                        temp_file.write(chunk)
+                        hasher.update(chunk)
+            except Exception as e:
+                os.unlink(temp_file.name)
+                members.append({"filename": filename, "error": str(e)})
+                continue
+
+            members.append({"filename": filename, "path": temp_file.name, "sha256": hasher.hexdigest()})
+
+    logger.info(f"Extracted {len([m for m in members if 'path' in m])} {suffix} files from {zip_path}")
+    return members
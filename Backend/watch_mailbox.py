@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Watch a drop directory and enqueue new or changed .msg files for analysis
+
+Files are sent to the Celery analysis pipeline (parse_msg then
+analyze_submission), so Redis and the Celery workers must be running.
+
+Usage:
+    python watch_mailbox.py /path/to/dropbox
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+from utils.redis_checker import is_redis_available
+from services.mailbox_watcher_service import (
+    MailboxWatcher,
+    WATCH_INDEX_PATH,
+    WATCH_STAGING_DIR,
+    WATCH_SETTLE_SECONDS,
+    WATCH_BATCH_SIZE,
+    WATCH_POLL_INTERVAL_SECONDS,
+    WATCH_FORCE_POLLING,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Enqueue new or changed .msg files from a drop directory.')
+    parser.add_argument('watch_dir', nargs='?', default=os.getenv('WATCH_DIR'), help='Drop directory (default: WATCH_DIR)')
+    parser.add_argument('--index', default=WATCH_INDEX_PATH, help='Persistent index of enqueued files')
+    parser.add_argument('--staging-dir', default=WATCH_STAGING_DIR, help='Where files are staged for the workers')
+    parser.add_argument('--settle-seconds', type=float, default=WATCH_SETTLE_SECONDS, help='Quiet period before a file is picked up')
+    parser.add_argument('--batch-size', type=int, default=WATCH_BATCH_SIZE, help='Maximum files enqueued per batch')
+    parser.add_argument('--poll-interval', type=float, default=WATCH_POLL_INTERVAL_SECONDS, help='Seconds between scans when polling')
+    parser.add_argument('--force-polling', action='store_true', default=WATCH_FORCE_POLLING, help='Poll instead of using file system events (e.g. network shares)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not args.watch_dir or not os.path.isdir(args.watch_dir):
+        print(f"Directory {args.watch_dir} does not exist.", file=sys.stderr)
+        return 1
+
+    if not is_redis_available():
+        print("Redis is not available; start Redis and a Celery worker first.", file=sys.stderr)
+        return 1
+
+    watcher = MailboxWatcher(
+        args.watch_dir,
+        index_path=args.index,
+        staging_dir=args.staging_dir,
+        settle_seconds=args.settle_seconds,
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+        force_polling=args.force_polling
+    )
+    watcher.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import { NextRequest } from 'next/server';
+
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || 'https://ai-powered-facultative-reinsurancedecisionsupportsystem.replit.app';
+
+// Relay the backend's Server-Sent Events stream without buffering it
+export const dynamic = 'force-dynamic';
+
+export async function GET(
+  request: NextRequest,
+  { params }: { params: { taskId: string } }
+) {
+  const { taskId } = params;
+
+  try {
+    const response = await fetch(`${API_BASE_URL}/task-events/${taskId}`, {
+      method: 'GET',
+      headers: {
+        Accept: 'text/event-stream',
+      },
+      cache: 'no-store',
+      signal: request.signal,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+    }
+
+    return new Response(response.body, {
+      headers: {
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache, no-transform',
+        Connection: 'keep-alive',
+        'X-Accel-Buffering': 'no',
+      },
+    });
+  } catch (error) {
+    console.error('Error opening task event stream:', error);
+    return new Response('Failed to open task event stream', { status: 502 });
+  }
+}
@@ -17,6 +17,14 @@ import {
 } from 'lucide-react';
 import { TaskStatus, AnalysisResult } from '@/lib/api';
 
+interface ParsedDocumentEvent {
+  filename: string;
+  status: string;
+  cache_hit: boolean;
+  characters: number;
+  completed: number;
+}
+
 interface TaskStatusTrackerProps {
   taskId: string;
   onComplete?: (result: AnalysisResult) => void;
@@ -35,6 +43,10 @@ const TaskStatusTracker: React.FC<TaskStatusTrackerProps> = ({
   const [status, setStatus] = useState<TaskStatus | null>(null);
   const [isPolling, setIsPolling] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  // Server-Sent Events from /task-events; falls back to polling when unavailable
+  const [useStreaming, setUseStreaming] = useState(true);
+  const [documents, setDocuments] = useState<ParsedDocumentEvent[]>([]);
+  const [streamedText, setStreamedText] = useState('');
 
   const getStatusIcon = (status: string) => {
     switch (status) {
@@ -113,7 +125,75 @@ const TaskStatusTracker: React.FC<TaskStatusTrackerProps> = ({
   };
 
   useEffect(() => {
-    if (autoPoll && taskId) {
+    if (!autoPoll || !taskId || !useStreaming) return;
+    if (typeof window === 'undefined' || !('EventSource' in window)) {
+      setUseStreaming(false);
+      return;
+    }
+
+    const source = new EventSource(`/api/task-events/${taskId}`);
+    let finished = false;
+    const finish = () => {
+      finished = true;
+      source.close();
+    };
+    const parse = (event: Event) => JSON.parse((event as MessageEvent).data);
+
+    source.addEventListener('status', (event) => {
+      const data: TaskStatus = parse(event);
+      setStatus(data);
+      if (data.status === 'SUCCESS' || (data.status as string) === 'FAILURE') {
+        // Already finished: fetch the full status once, including the result
+        finish();
+        pollStatus();
+      }
+    });
+    source.addEventListener('stage', (event) => {
+      const data = parse(event);
+      setStatus((prev) => ({
+        ...(prev ?? { task_id: taskId }),
+        status: 'PROCESSING',
+        progress: data.progress,
+        current_status: data.status,
+      }));
+    });
+    source.addEventListener('document', (event) => {
+      const data: ParsedDocumentEvent = parse(event);
+      setDocuments((prev) => [...prev, data]);
+    });
+    source.addEventListener('token', (event) => {
+      const data = parse(event);
+      setStreamedText((prev) => prev + data.text);
+    });
+    source.addEventListener('completed', () => {
+      finish();
+      pollStatus();
+    });
+    source.addEventListener('failed', (event) => {
+      const data = parse(event);
+      finish();
+      setStatus((prev) => ({
+        ...(prev ?? { task_id: taskId }),
+        status: 'FAILED',
+        current_status: data.status,
+        error: data.error,
+      }));
+      if (onError) {
+        onError(data.error || 'Analysis failed');
+      }
+    });
+    source.onerror = () => {
+      if (!finished) {
+        finish();
+        setUseStreaming(false);
+      }
+    };
+
+    return () => source.close();
+  }, [taskId, autoPoll, useStreaming]);
+
+  useEffect(() => {
+    if (autoPoll && taskId && !useStreaming) {
       pollStatus();
       
       const interval = setInterval(() => {
@@ -126,7 +206,7 @@ const TaskStatusTracker: React.FC<TaskStatusTrackerProps> = ({
 
       return () => clearInterval(interval);
     }
-  }, [taskId, autoPoll, pollInterval, status?.status]);
+  }, [taskId, autoPoll, pollInterval, status?.status, useStreaming]);
 
   const handleManualRefresh = () => {
     pollStatus();
@@ -227,6 +307,36 @@ const TaskStatusTracker: React.FC<TaskStatusTrackerProps> = ({
               )}
             </div>
 
+            {/* Documents parsed so far */}
+            {documents.length > 0 && status.status !== 'SUCCESS' && (
+              <div className="space-y-2">
+                <h4 className="text-sm font-medium text-gray-900">Documents Parsed</h4>
+                <div className="space-y-1 text-xs text-gray-600">
+                  {documents.map((doc) => (
+                    <div key={`${doc.completed}-${doc.filename}`} className="flex items-center space-x-2">
+                      <div className={`w-2 h-2 rounded-full ${
+                        doc.status === 'success' ? 'bg-green-500' : 'bg-red-500'
+                      }`}></div>
+                      <span>{doc.filename}</span>
+                      <span className="text-gray-400">
+                        {doc.cache_hit ? 'cached' : `${doc.characters.toLocaleString()} characters`}
+                      </span>
+                    </div>
+                  ))}
+                </div>
+              </div>
+            )}
+
+            {/* Analysis as it is generated */}
+            {streamedText && status.status !== 'SUCCESS' && (
+              <div className="space-y-2">
+                <h4 className="text-sm font-medium text-gray-900">Generating Analysis</h4>
+                <pre className="max-h-32 overflow-hidden whitespace-pre-wrap break-all rounded-md bg-gray-50 p-3 text-xs text-gray-600 font-mono">
+                  {streamedText.slice(-600)}
+                </pre>
+              </div>
+            )}
+
             {/* Processing Steps */}
             {status.status === 'PROCESSING' && (
               <div className="space-y-2">
@@ -96,6 +96,36 @@ export interface AnalysisResult {
   processing_mode: string;
 }
 
+export interface BatchItem {
+  filename: string;
+  task_id?: string;
+  status: 'submitted' | 'duplicate' | 'attached' | 'rejected';
+  state?: string;
+  progress?: number;
+  error?: string;
+}
+
+export interface BatchSubmission {
+  batch_id: string;
+  message: string;
+  total: number;
+  submitted: number;
+  duplicates: number;
+  rejected: number;
+  items: BatchItem[];
+}
+
+export interface BatchStatus {
+  batch_id: string;
+  total: number;
+  progress: number;
+  completed: boolean;
+  counts: Record<string, number>;
+  elapsed_seconds: number;
+  files_per_minute: number;
+  items: BatchItem[];
+}
+
 export interface ApiError {
   detail: string;
   error_code?: string;
@@ -161,6 +191,23 @@ class ApiService {
     });
   }
 
+  // Submit many .msg files (or zip archives of them) in one request
+  async submitAnalysisBatch(files: File[]): Promise<BatchSubmission> {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+
+    return this.makeRequest('/submit-analysis-batch', {
+      method: 'POST',
+      headers: {}, // Remove Content-Type to let browser set it with boundary
+      body: formData,
+    });
+  }
+
+  // Get aggregate batch progress
+  async getBatchStatus(batchId: string): Promise<BatchStatus> {
+    return this.makeRequest(`/batch-status/${batchId}`);
+  }
+
   // Get task status
   async getTaskStatus(taskId: string): Promise<TaskStatus> {
     return this.makeRequest(`/task-status/${taskId}`);